@@ -0,0 +1,460 @@
+"""Balancing market alarm rules, free of Streamlit and telephony.
+
+``evaluate_alarms`` takes the activation + marginal price frame the
+dashboards show (one row per quarter-hour, indexed by the tz-aware interval
+start like every damas.py report, possibly with more context.py columns)
+and returns every alarm it implies as ``Alarm`` tuples, where alarm_time is
+the Unix timestamp of the interval the alarm is about. The poller runs it on
+every refresh and the pages only display what it stored.
+
+An alarm is identified by its rule, the interval it is about and its
+direction. ``Alarm.key`` hashes the three into the 64-bit integer the store
+indexes alarms by, so an alarm is stored and called for once whatever the
+wording of its message, across poller restarts too.
+
+The interval rules are declared in alarm_rules.json (BM_ALARM_RULES_PATH):
+
+    thresholds      name -> default value, overridable per call
+    columns         name -> frame column the rules read
+    missing_as_zero names whose missing values count as 0 (others stay NaN,
+                    so comparisons on them are false until published)
+    derived         name -> expression over the columns, e.g. totals
+    rules           id, direction, severity ("Critical" / "Warning"),
+                    expression, optional values (name -> expression) and
+                    quiet_hours (["HH:MM", "HH:MM"], no calls inside), and a
+                    message template with {at} and the values
+
+Expressions are Python syntax over those names: every name is its value in
+the interval, prev_<name> the one in the interval before, thresholds are
+plain numbers, and abs/min/max, arithmetic, comparisons and and/or/not are
+allowed. load_rules checks and compiles them once into elementwise NumPy
+expressions, so each rule is evaluated over the whole frame at once and only
+the alarms that fire are formatted. The no data, stale data and missing
+mFRR update checks are about the clock rather than intervals and stay here.
+
+``evaluate_profiles`` runs the same rules for many threshold profiles (one
+per desk user, say) in one broadcast pass over the shared intervals; the
+poller evaluates the profiles saved from the dashboards this way
+(``evaluate_new_profiles``), replay.py the --profile ones.
+"""
+import ast
+import hashlib
+import json
+import os
+import string
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import pytz
+
+eet_timezone = pytz.timezone("Europe/Bucharest")
+
+ALARM_RULES_PATH = os.getenv("BM_ALARM_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "alarm_rules.json"))
+
+# Critical alarm when the newest interval ended longer ago than this
+DATA_STALE_AFTER = timedelta(minutes=20)
+
+# Critical alarm when mFRR was active and the next interval, due within this
+# many minutes, has no update yet
+MFRR_UPDATE_LEAD_MINUTES = 9
+
+# Length of one activation interval
+INTERVAL = timedelta(minutes=15)
+
+# Intervals before the last evaluated one that evaluate_new_alarms checks
+# again, so late DAMAS revisions of recent intervals still raise their alarms
+RECHECK_INTERVALS = 2
+
+# Columns the missing mFRR update check reads
+MFRR_COLUMNS = ["mFRR Up (MWh)", "mFRR Down (MWh)"]
+
+# Functions rule expressions may call, all elementwise
+RULE_FUNCTIONS = {"abs": np.abs, "min": np.minimum, "max": np.maximum}
+
+# Syntax allowed in rule expressions, before and/or/not become &/|/~
+RULE_NODES = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Constant, ast.Load,
+    ast.And, ast.Or, ast.Not, ast.USub, ast.UAdd, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+
+class Alarm(namedtuple("Alarm", ["alarm_time", "message", "alarm_type", "rule", "direction"])):
+    """One raised alarm; rule and direction ("up", "down" or "") name the condition that fired."""
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return alarm_key(self.rule, self.alarm_time, self.direction)
+
+
+def alarm_key(rule, alarm_time, direction=""):
+    """Stable signed 64-bit key of (rule, interval start as Unix timestamp, direction)."""
+    digest = hashlib.blake2b(f"{rule}|{alarm_time:.0f}|{direction}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+class _Elementwise(ast.NodeTransformer):
+    """Rewrite and/or/not and chained comparisons into the &/|/~ NumPy applies elementwise."""
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        return reduce(lambda left, right: ast.BinOp(left, op, right), node.values)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        return ast.UnaryOp(ast.Invert(), node.operand) if isinstance(node.op, ast.Not) else node
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        operands = [node.left, *node.comparators]
+        pairs = [ast.Compare(left, [op], [right]) for left, op, right in zip(operands, node.ops, operands[1:])]
+        return reduce(lambda left, right: ast.BinOp(left, ast.BitAnd(), right), pairs)
+
+
+def compile_expression(expression, names, where):
+    """Check a rule expression against the allowed syntax and names, and compile it."""
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"{where}: invalid expression {expression!r}: {e.msg}") from None
+
+    for node in ast.walk(tree):
+        if not isinstance(node, RULE_NODES):
+            raise ValueError(f"{where}: {type(node).__name__} is not allowed in {expression!r}")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in RULE_FUNCTIONS or node.keywords):
+            raise ValueError(f"{where}: only {', '.join(RULE_FUNCTIONS)} can be called in {expression!r}")
+        if isinstance(node, ast.Name) and node.id not in names and node.id not in RULE_FUNCTIONS:
+            raise ValueError(f"{where}: unknown name {node.id!r} in {expression!r}")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"{where}: only numbers are allowed as constants in {expression!r}")
+
+    tree = ast.fix_missing_locations(_Elementwise().visit(tree))
+    return compile(tree, f"<{where}>", "eval")
+
+
+def parse_quiet_hours(value, where):
+    if value is None:
+        return None
+    try:
+        start, end = (time.fromisoformat(bound) for bound in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{where}: quiet_hours must be two HH:MM times, got {value!r}") from None
+    return start, end
+
+
+def load_rules(path=None):
+    """
+    Read and compile an alarm rule file (alarm_rules.json by default).
+
+    Raises ValueError naming the rule at fault for anything that does not
+    compile or cannot run on columns (see check_rules), so a bad file fails
+    at start-up rather than on the first alarm.
+    """
+    path = path or ALARM_RULES_PATH
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    thresholds = dict(config.get("thresholds", {}))
+    columns = dict(config.get("columns", {}))
+    missing_as_zero = set(config.get("missing_as_zero", []))
+    unknown = missing_as_zero - set(columns)
+    if unknown:
+        raise ValueError(f"{path}: missing_as_zero names unknown columns {sorted(unknown)}")
+
+    # Derived names are computed in order over whole columns, so each can use the ones before it
+    derived = []
+    names = set(thresholds) | set(columns)
+    for name, expression in config.get("derived", {}).items():
+        derived.append((name, compile_expression(expression, names, f"{path}: derived {name}")))
+        names.add(name)
+
+    series = set(columns) | {name for name, _ in derived}
+    names = set(thresholds) | series | {f"prev_{name}" for name in series}
+    rules = []
+    for position, rule in enumerate(config.get("rules", [])):
+        where = f"{path}: rule {rule.get('id', position)}"
+        if "id" not in rule or "expression" not in rule or "message" not in rule:
+            raise ValueError(f"{where}: id, expression and message are required")
+        if rule.get("severity", "Warning") not in ("Critical", "Warning"):
+            raise ValueError(f"{where}: severity must be Critical or Warning")
+
+        values = [(name, compile_expression(expression, names, f"{where} value {name}"))
+                  for name, expression in rule.get("values", {}).items()]
+        fields = {field.split(".")[0].split("[")[0] for _, field, _, _ in string.Formatter().parse(rule["message"]) if field}
+        unknown = fields - {"at"} - {name for name, _ in values}
+        if unknown:
+            raise ValueError(f"{where}: message uses undefined values {sorted(unknown)}")
+
+        rules.append({
+            "id": rule["id"],
+            "direction": rule.get("direction", ""),
+            "severity": rule.get("severity", "Warning"),
+            "quiet_hours": parse_quiet_hours(rule.get("quiet_hours"), where),
+            "expression": compile_expression(rule["expression"], names, where),
+            "values": values,
+            "message": rule["message"],
+        })
+
+    compiled = {"thresholds": thresholds, "columns": columns, "missing_as_zero": missing_as_zero, "derived": derived, "rules": rules}
+    check_rules(compiled, path)
+    return compiled
+
+
+def check_rules(rules, path):
+    """
+    Run every derived name, rule and value of compiled rules once on a small
+    dummy frame, the way evaluate_profiles does. Expressions that compile
+    but fail on columns (not on a number, a call with the wrong number of
+    arguments) or whose condition is not true/false raise ValueError.
+    """
+    no_builtins = {"__builtins__": {}}
+    shape = (1, 2)
+
+    def run(expression, namespace, where):
+        try:
+            return eval(expression, no_builtins, namespace)
+        except Exception as e:
+            raise ValueError(f"{where}: cannot be evaluated: {e}") from None
+
+    thresholds = {name: np.array([[float(value)]]) for name, value in rules["thresholds"].items()}
+    columns = {name: np.array([1.0, 2.0, 3.0]) for name in rules["columns"]}
+    with np.errstate(all="ignore"):
+        for name, expression in rules["derived"]:
+            columns[name] = run(expression, {**RULE_FUNCTIONS, **thresholds, **columns}, f"{path}: derived {name}")
+
+        namespace = {**RULE_FUNCTIONS, **thresholds}
+        for name, column in columns.items():
+            namespace[name] = np.asarray(column)[..., 1:]
+            namespace[f"prev_{name}"] = np.asarray(column)[..., :-1]
+        for rule in rules["rules"]:
+            where = f"{path}: rule {rule['id']}"
+            checked = [(where, run(rule["expression"], namespace, where))]
+            if np.asarray(checked[0][1]).dtype != bool:
+                raise ValueError(f"{where}: expression must be a condition (true/false), not a number")
+            checked += [(f"{where} value {name}", run(expression, namespace, f"{where} value {name}")) for name, expression in rule["values"]]
+            for what, result in checked:
+                try:
+                    np.broadcast_to(result, shape)
+                except ValueError:
+                    raise ValueError(f"{what}: result of shape {np.shape(result)} does not line up with the intervals") from None
+
+
+RULES = load_rules()
+
+# Default thresholds, as declared in the rule file (MWh)
+DEFAULT_THRESHOLDS = RULES["thresholds"]
+
+
+def is_quiet(rule_id, now=None, rules=None):
+    """True when now (EET) falls in the quiet hours of a rule, when its alarms do not trigger calls."""
+    current_time_eet = (now or datetime.now(eet_timezone)).astimezone(eet_timezone).time()
+    for rule in (rules or RULES)["rules"]:
+        if rule["id"] != rule_id or rule["quiet_hours"] is None:
+            continue
+        start, end = rule["quiet_hours"]
+        if start <= current_time_eet <= end if start <= end else current_time_eet >= start or current_time_eet <= end:
+            return True
+    return False
+
+
+def build_activation_frame(activation_df, price_df):
+    """Join activation volumes with marginal prices on the interval index, sorted by interval start."""
+    return activation_df.join(price_df, how="left").sort_index()
+
+
+def evaluate_alarms(df, thresholds=None, now=None, since=None, rules=None):
+    """
+    Return every alarm raised by the activation frame df, under the compiled
+    rules (load_rules; RULES by default).
+
+    Alarms are Alarm tuples with alarm_type "Critical" or "Warning". The
+    same condition on the same interval always yields the same Alarm.key,
+    which callers de-duplicate on.
+
+    With since, the interval rules only run for intervals starting after it,
+    and the work is proportional to those intervals rather than to df.
+    """
+    return evaluate_profiles(df, {None: thresholds}, now, since, rules)[None]
+
+
+def evaluate_profiles(df, profiles, now=None, since=None, rules=None):
+    """
+    evaluate_alarms for several threshold profiles at once: profiles maps a
+    profile name to its thresholds (overriding the rule file's defaults) and
+    the result maps it to its alarms.
+
+    The thresholds are stacked into one column per name, so every rule is
+    evaluated once as a (profile, interval) array and the work hardly grows
+    with the number of profiles; only the alarms that fire are formatted,
+    once for all the profiles they fire for.
+    """
+    rules = rules or RULES
+    names = list(profiles)
+    thresholds = {
+        name: np.array([[(profiles[profile] or {}).get(name, default)] for profile in names])
+        for name, default in rules["thresholds"].items()
+    }
+    now = (now or datetime.now(eet_timezone)).astimezone(eet_timezone)
+    # Alarms of the checks that read no thresholds, raised for every profile
+    shared = []
+
+    def raise_alarm(alarm_time, message, alarm_type, rule, direction=""):
+        shared.append(Alarm(alarm_time.timestamp(), message, alarm_type, rule, direction))
+
+    # Check for no data at all, or no update within 20 minutes (Critical Alarm).
+    # Right after midnight the new day has nothing published yet, so no data
+    # only counts once the day is DATA_STALE_AFTER old, like stale data
+    if df.empty:
+        midnight = eet_timezone.localize(datetime(now.year, now.month, now.day))
+        if now - midnight > DATA_STALE_AFTER:
+            raise_alarm(midnight, f"🚨 Critical: No data available from the server on {now:%Y-%m-%d}.", "Critical", "no_data")
+        return {profile: list(shared) for profile in names}
+
+    # Cut df down to the intervals after since, the one before them, and the
+    # last two (read by the mFRR check); first_new is the first one after since
+    first_new = 1
+    if since is not None:
+        after = int(df.index.searchsorted(since, side="right"))
+        start = max(0, min(after - 1, len(df) - 2))
+        df = df.iloc[start:]
+        first_new = max(1, after - start)
+
+    latest_start = df.index[-1].to_pydatetime()
+    latest_end = eet_timezone.normalize(latest_start + INTERVAL)
+    if now - latest_end > DATA_STALE_AFTER:
+        message = (f"🚨 Critical: No new data received for more than {DATA_STALE_AFTER.seconds // 60} minutes "
+                   f"(last update at {latest_end:%Y-%m-%d %H:%M:%S}).")
+        raise_alarm(latest_start, message, "Critical", "stale_data")
+    alarms = {profile: list(shared) for profile in names}
+
+    # Every name of the rule file as a whole column, then every interval
+    # rule checked over all intervals at once on the current and previous
+    # (prev_) columns: element [p, k] compares interval k + 1 with interval
+    # k under profile p. Thresholds are (profile, 1) columns, so expressions
+    # reading them broadcast to (profile, interval) arrays.
+    present = [column for column in dict.fromkeys([*MFRR_COLUMNS, *rules["columns"].values()]) if column in df.columns]
+    frame_columns = dict(zip(present, df[present].to_numpy(dtype="float64").T))
+    missing = np.full(len(df), np.nan)
+    no_builtins = {"__builtins__": {}}
+    columns = {}
+    for name, column in rules["columns"].items():
+        column_values = frame_columns.get(column, missing)
+        columns[name] = np.where(np.isnan(column_values), 0.0, column_values) if name in rules["missing_as_zero"] else column_values
+    for name, expression in rules["derived"]:
+        try:
+            columns[name] = eval(expression, no_builtins, {**RULE_FUNCTIONS, **thresholds, **columns})
+        except Exception as e:
+            # Rules reading it then compare NaN and stay quiet; the other rules still run
+            print(f"⚠️ Alarm rules: derived {name} failed: {e}")
+            columns[name] = missing
+
+    namespace = {**RULE_FUNCTIONS, **thresholds}
+    for name, column in columns.items():
+        namespace[name] = column[..., 1:]
+        namespace[f"prev_{name}"] = column[..., :-1]
+    shape = (len(names), len(df) - 1)
+    masks = np.empty((*shape, len(rules["rules"])), dtype=bool)
+    for index, rule in enumerate(rules["rules"]):
+        # A rule that fails is skipped for this evaluation, so it cannot silence the others
+        try:
+            masks[..., index] = eval(rule["expression"], no_builtins, namespace)
+        except Exception as e:
+            print(f"⚠️ Alarm rule {rule['id']} failed: {e}")
+            masks[..., index] = False
+
+    # (profile, element, rule) triples that fired, per profile interval by
+    # interval in rule order. Times and labels are only built for the
+    # intervals that fired, in one vectorized pass; each (interval, rule)
+    # pair is a distinct alarm. Values go through .item() so amounts print as
+    # Python floats.
+    fired = np.argwhere(masks)
+    fired = fired[fired[:, 1] >= first_new - 1]
+    rows = np.unique(fired[:, 1])
+    fired_starts = df.index[rows + 1]
+    epochs = (fired_starts.asi8 // 10**9).astype("float64").tolist()
+    labels = [label.replace("T", " ") for label in np.datetime_as_string(fired_starts.tz_localize(None).to_numpy(), unit="m").tolist()]
+    position = dict(zip(rows.tolist(), range(len(rows))))
+    values = {}
+    formatted = {}
+    for p, k, index in fired.tolist():
+        rule = rules["rules"][index]
+        if index not in values:
+            try:
+                rule_values = {name: eval(expression, no_builtins, namespace) for name, expression in rule["values"]}
+            except Exception as e:
+                print(f"⚠️ Alarm rule {rule['id']} values failed: {e}")
+                rule_values = None
+            # Messages differ per profile only when their values read thresholds
+            values[index] = rule_values, rule_values is not None and any(np.ndim(value) == 2 for value in rule_values.values())
+        rule_values, per_profile = values[index]
+        if rule_values is None:
+            continue
+        cache_key = (index, k, p if per_profile else None)
+        alarm = formatted.get(cache_key)
+        if alarm is None:
+            fields = {name: np.broadcast_to(value, shape).item(p, k) for name, value in rule_values.items()}
+            message = rule["message"].format(at=labels[position[k]], **fields)
+            alarm = formatted[cache_key] = Alarm(epochs[position[k]], message, rule["severity"], rule["id"], rule["direction"])
+        alarms[names[p]].append(alarm)
+
+    # mFRR deactivation: mFRR was active in the last two intervals but the next
+    # one has no update while it starts in less than 9 minutes (or has started)
+    if len(df) >= 2:
+        expected_next_interval = latest_end
+        missing_time = (expected_next_interval - now).total_seconds() / 60
+
+        # Unpublished (NaN) volumes compare as inactive
+        mfrr = np.column_stack([frame_columns[column][-2:] for column in MFRR_COLUMNS])
+        last_mFRR_active = bool((mfrr[-1] > 0).any())
+        prev_mFRR_active = bool((mfrr[-2] > 0).any())
+
+        if (last_mFRR_active or prev_mFRR_active) and (missing_time <= MFRR_UPDATE_LEAD_MINUTES or now >= expected_next_interval):
+            message = (f"🚨 Critical: No new mFRR update detected for the next interval starting at {expected_next_interval}. "
+                       f"The next interval may rely solely on aFRR.")
+            alarm = Alarm(expected_next_interval.timestamp(), message, "Critical", "mfrr_update_missing", "")
+            for profile in names:
+                alarms[profile].append(alarm)
+
+    return alarms
+
+
+def evaluate_new_alarms(df, state, thresholds=None, now=None, rules=None):
+    """
+    Incremental evaluate_alarms: the interval rules only run for the
+    intervals that arrived since the previous call (plus RECHECK_INTERVALS
+    before them), so a refresh costs O(new intervals) at any time of day.
+
+    state is a dict owned by the caller (start with {}) holding the last
+    evaluated interval and its row; it is updated in place and
+    starts over on a new EET day. df may be the whole day so far or only the
+    intervals that arrived since, the previous interval then comes from the
+    state. The stale data and missing mFRR update checks run on every call.
+    """
+    return evaluate_new_profiles(df, state, {None: thresholds}, now, rules)[None]
+
+
+def evaluate_new_profiles(df, state, profiles, now=None, rules=None):
+    """Incremental evaluate_profiles, with one state for all the profiles (see evaluate_new_alarms)."""
+    last_start = state.get("last_start")
+    if last_start is not None and (df.empty or df.index[-1].date() != last_start.date()):
+        state.clear()
+        last_start = None
+
+    since = None
+    if last_start is not None:
+        if df.index[0] > last_start:
+            df = pd.concat([state["last_row"], df])
+            since = last_start
+        else:
+            since = last_start - RECHECK_INTERVALS * INTERVAL
+
+    alarms = evaluate_profiles(df, profiles, now, since=since, rules=rules)
+    if not df.empty:
+        state["last_start"] = df.index[-1]
+        state["last_row"] = df.iloc[[-1]]
+    return alarms
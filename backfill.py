@@ -0,0 +1,115 @@
+"""Backfill historical DAMAS reports into the local interval store.
+
+Splits an EET date range into day chunks and fetches them in parallel with a
+bounded number of workers over the shared DAMAS session. Each day is
+streamed (damas.iter_report_item_chunks) and stored chunk by chunk. Finished
+days are recorded in the store, so an interrupted run picks up where it
+stopped. With --export the range is then written out as one CSV per report,
+read back from the store in chunks (damas.iter_history_frames), so a year of
+history never sits in memory whole.
+
+Example:
+    python backfill.py 2024-01-01 2024-12-31 --workers 8
+    python backfill.py 2024-01-01 2024-12-31 --export history/
+"""
+import os
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import pytz
+
+import damas
+import store
+
+# DAMAS reports worth keeping history for (activation, marginal prices,
+# imbalance volumes / IGCC / unintended deviation, imbalance prices)
+BACKFILL_REPORTS = [
+    "activatedBalancingEnergyOverview",
+    "marginalPricesOverview",
+    "estimatedPowerSystemImbalance",
+    "estimatedImbalancePrices",
+]
+
+
+def backfill_day(report, day):
+    """Fetch and store one EET day of one report; returns the number of items stored."""
+    utc_from, utc_to = (bound.astimezone(pytz.utc) for bound in damas.day_bounds(day))
+    # Streamed and stored chunk by chunk, so a long day never sits in memory whole
+    count = 0
+    for items in damas.iter_report_item_chunks(report, utc_from, utc_to):
+        count += store.save_items(report, items)
+
+    # Today is still being published, so it is never marked as done; nor is a
+    # day that came back empty, which is retried on the next run
+    if not count:
+        print(f"⚠️ {report} {day}: no items returned, will retry on the next run.")
+    elif day < datetime.now(damas.eet_timezone).date():
+        store.mark_backfilled(report, day, count)
+    return count
+
+
+def backfill(start_day, end_day, reports=None, workers=8):
+    """Backfill every day in [start_day, end_day] for the given reports, skipping finished days."""
+    reports = reports or BACKFILL_REPORTS
+
+    chunks = []
+    for report in reports:
+        done = store.backfilled_days(report)
+        day = start_day
+        while day <= end_day:
+            if day not in done:
+                chunks.append((report, day))
+            day += timedelta(days=1)
+
+    print(f"Backfilling {len(chunks)} report-days with {workers} workers...")
+    started = time.monotonic()
+    failed = []
+    stored = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(backfill_day, report, day): (report, day) for report, day in chunks}
+        for done_count, future in enumerate(as_completed(futures), start=1):
+            report, day = futures[future]
+            try:
+                stored += future.result()
+            except Exception as e:
+                failed.append((report, day))
+                print(f"❌ {report} {day}: {e}")
+            if done_count % 50 == 0:
+                print(f"... {done_count}/{len(chunks)} report-days done")
+
+    print(f"✅ Stored {stored} intervals in {time.monotonic() - started:.1f}s, {len(failed)} report-days failed.")
+    if failed:
+        print("Run the same command again to retry the failed days.")
+    return failed
+
+
+def export(start_day, end_day, directory, reports=None):
+    """Write the stored items of [start_day, end_day] to <directory>/<report>.csv, chunk by chunk."""
+    os.makedirs(directory, exist_ok=True)
+    eet_from, _ = damas.day_bounds(start_day)
+    _, eet_to = damas.day_bounds(end_day)
+    for report in reports or BACKFILL_REPORTS:
+        path = os.path.join(directory, f"{report}.csv")
+        rows = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            for frame in damas.iter_history_frames(report, eet_from, eet_to):
+                frame.to_csv(f, header=rows == 0, index=False)
+                rows += len(frame)
+        print(f"💾 {report}: {rows} intervals -> {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill DAMAS reports into the local interval store.")
+    parser.add_argument("start", type=damas.parse_day, help="First EET day to fetch (YYYY-MM-DD)")
+    parser.add_argument("end", type=damas.parse_day, help="Last EET day to fetch, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--reports", nargs="+", default=BACKFILL_REPORTS, help="DAMAS report names to fetch")
+    parser.add_argument("--workers", type=int, default=8, help="Number of days fetched at the same time")
+    parser.add_argument("--export", metavar="DIR", help="Then write the range to DIR/<report>.csv")
+    args = parser.parse_args()
+
+    backfill(args.start, args.end, reports=args.reports, workers=args.workers)
+    if args.export:
+        export(args.start, args.end, args.export, reports=args.reports)
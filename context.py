@@ -0,0 +1,77 @@
+"""One aligned balancing market context per refresh.
+
+build_context puts every DAMAS report (and the cached ENTSO-E series) on
+today's quarter-hour grid in a single frame. It is built once per poll or
+page run, and the table, the alarm engine and the expert advisor all read
+their views out of that same frame instead of reading and merging the
+reports again:
+
+    ctx = context.build_context(poller.read_reports())
+    table = context.activation_view(ctx)          # activation + marginal prices
+    alarms.evaluate_alarms(context.alarm_view(ctx))
+    prompt_rows = context.expert_view(ctx, now)   # last ended intervals, gaps as 0
+"""
+from datetime import datetime
+
+import damas
+import entsoe
+
+# Columns of the activation table the pages show and the alarms read
+ACTIVATION_COLUMNS = [*damas.report_columns("activation"), *damas.report_columns("marginal_prices")]
+
+# Columns the expert advisor reads missing values of as 0
+EXPERT_FILLED_COLUMNS = [
+    *ACTIVATION_COLUMNS,
+    *damas.report_columns("imbalance_prices"),
+    *damas.report_columns("imbalance_volumes"),
+    *damas.report_columns("igcc"),
+]
+
+# Ended intervals handed to the expert advisor
+EXPERT_INTERVALS = 12
+
+
+def build_context(reports, day=None, with_entsoe=True):
+    """
+    Align report frames (name -> canonical frame, as read_reports returns) on
+    the grid of an EET day, today by default.
+
+    The frame keeps the earliest stale_since of its reports in attrs.
+    """
+    frames = [reports[name] for name in damas.REPORTS if name in reports]
+    ctx = damas.align_reports(frames, day=day)
+    if with_entsoe and not ctx.empty:
+        ctx = entsoe.merge_on_grid(ctx, eet_from=ctx.index[0], eet_to=ctx.index[-1] + damas.INTERVAL)
+
+    stale = [df.attrs.get("stale_since") for df in frames if df.attrs.get("stale_since") is not None]
+    ctx.attrs["stale_since"] = min(stale) if stale else None
+    return ctx
+
+
+def activation_view(ctx):
+    """Intervals with published activation volumes, with their marginal prices."""
+    columns = [column for column in ACTIVATION_COLUMNS if column in ctx.columns]
+    activation = damas.report_columns("activation")
+    if not set(activation) <= set(columns):
+        return damas.empty_frame(ACTIVATION_COLUMNS)
+    return ctx.loc[ctx[activation].notna().any(axis=1), columns]
+
+
+def alarm_view(ctx):
+    """
+    The intervals of activation_view with every context column, for alarm
+    rules on imbalance volumes, IGCC or prices next to the activation.
+    """
+    activation = damas.report_columns("activation")
+    if not set(activation) <= set(ctx.columns):
+        return damas.empty_frame(ACTIVATION_COLUMNS)
+    return ctx[ctx[activation].notna().any(axis=1)]
+
+
+def expert_view(ctx, now=None, intervals=EXPERT_INTERVALS):
+    """The last intervals that ended before now, with unpublished volumes and prices as 0."""
+    now = now or datetime.now(damas.eet_timezone)
+    ended = ctx[ctx.index + damas.INTERVAL < now].tail(intervals).copy()
+    filled = [column for column in EXPERT_FILLED_COLUMNS if column in ended.columns]
+    ended[filled] = ended[filled].fillna(0)
+    return ended
@@ -0,0 +1,734 @@
+"""Shared fetch layer for the Transelectrica DAMAS public reports.
+
+All report requests go through one keep-alive ``requests.Session`` so the
+TLS handshake to newmarkets.transelectrica.ro is paid once per process, and
+``fetch_all_reports`` fans the reports out over a thread pool so a refresh
+costs as much as the slowest report instead of the sum of all of them.
+
+Each report keeps an in-memory cache of today's items. After the first poll
+of the day only the tail since the last seen interval (plus a small overlap
+for revisions) is requested and merged into the cached day. Fetched items are
+also written to the on-disk interval store (store.py), which warm-starts the
+cache after a restart and holds history from previous days.
+
+Requests are retried with jittered exponential backoff, and every report has
+a circuit breaker. While a report's upstream is failing, its last good
+cached day is served instead of an empty frame, flagged through
+``df.attrs["stale_since"]``.
+
+Report frames are canonical: indexed by the tz-aware Europe/Bucharest
+interval start ("Interval Start (EET)"), one float column per value, sorted.
+Joins between reports are index joins; the "Time Period (EET)" labels and
+naive "Timestamp" columns the pages show are only built by display_frame.
+align_reports puts several reports side by side on the precomputed
+quarter-hour grid of their EET day (92, 96 or 100 intervals across DST).
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+import pytz
+import requests
+from requests.adapters import HTTPAdapter
+
+import store
+
+# Base URL of the publicReport endpoints; point DAMAS_BASE_URL at a local
+# stand-in (damas_stub.py) to run everything offline
+DAMAS_REPORT_URL = os.getenv("DAMAS_BASE_URL") or (
+    "https://newmarkets.transelectrica.ro/usy-durom-publicreportg01/"
+    "00121002500000000000000000000100/publicReport/"
+)
+if not DAMAS_REPORT_URL.endswith("/"):
+    DAMAS_REPORT_URL += "/"
+
+# Largest page the DAMAS publicReport endpoints serve in one response
+PAGE_SIZE = 3000
+
+# Page numbering used when a response does not say which page it is
+FIRST_PAGE_NUMBER = 0
+
+# Upper bound on pages of one report fetched at the same time
+PAGE_FETCH_WORKERS = 4
+
+# Items (or rows) per chunk yielded by the streaming readers
+# (iter_report_item_chunks, iter_history_frames)
+STREAM_CHUNK_SIZE = 5000
+
+# (connect, read) timeout in seconds for every DAMAS request
+REQUEST_TIMEOUT = (
+    float(os.getenv("DAMAS_CONNECT_TIMEOUT", 5)),
+    float(os.getenv("DAMAS_READ_TIMEOUT", 30)),
+)
+
+# Attempts per request and the base of the exponential backoff between them
+RETRY_ATTEMPTS = int(os.getenv("DAMAS_RETRY_ATTEMPTS", 3))
+RETRY_BACKOFF_SECONDS = float(os.getenv("DAMAS_RETRY_BACKOFF_SECONDS", 0.5))
+
+# Consecutive failed requests that open a report's circuit breaker, and how
+# long it stays open before one trial request is let through (half-open);
+# the others keep failing fast until the trial succeeds, or for another
+# cooldown if it never reports back
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("DAMAS_BREAKER_FAILURES", 3))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("DAMAS_BREAKER_COOLDOWN_SECONDS", 60))
+
+# How far behind the last seen interval a delta fetch starts, so late
+# revisions of the most recent quarter-hours are picked up
+DELTA_OVERLAP = timedelta(minutes=30)
+
+# Length of one DAMAS interval and the name of the canonical frame index
+INTERVAL = timedelta(minutes=15)
+INTERVAL_INDEX = "Interval Start (EET)"
+
+eet_timezone = pytz.timezone("Europe/Bucharest")
+
+_session = None
+_session_lock = threading.Lock()
+
+# Report name -> {"day": EET date, "items": {interval start (UTC): item}, "last_from": UTC datetime}
+_day_cache = {}
+_day_cache_lock = threading.Lock()
+
+# Report name -> {"failures": consecutive failures, "opened_at": monotonic time or None,
+#                 "trial_at": monotonic time of the half-open trial request or None}
+_breakers = {}
+# Report name -> EET datetime of the first failed refresh while serving cached data
+_stale_since = {}
+_breaker_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of sending a request while a report's circuit breaker is open."""
+
+
+def get_session():
+    """Return the process-wide keep-alive session used for all DAMAS requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # One pool per host, large enough for every report to be in flight at once
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def breaker_allows(report):
+    """
+    Return True if a request for report may go out: the breaker is closed,
+    or it is open, cooled down and this request becomes its one trial.
+    """
+    with _breaker_lock:
+        breaker = _breakers.get(report)
+        if breaker is None or breaker["opened_at"] is None:
+            return True
+        now = time.monotonic()
+        if now - breaker["opened_at"] < BREAKER_COOLDOWN_SECONDS:
+            return False
+        if breaker["trial_at"] is not None and now - breaker["trial_at"] < BREAKER_COOLDOWN_SECONDS:
+            return False
+        breaker["trial_at"] = now
+        return True
+
+
+def record_request_outcome(report, ok):
+    """Close the breaker of report after a success, count a failure otherwise."""
+    with _breaker_lock:
+        if ok:
+            _breakers.pop(report, None)
+            return
+
+        breaker = _breakers.setdefault(report, {"failures": 0, "opened_at": None, "trial_at": None})
+        breaker["failures"] += 1
+        if breaker["failures"] >= BREAKER_FAILURE_THRESHOLD:
+            if breaker["opened_at"] is None:
+                print(f"🔌 {report}: circuit breaker opened after {breaker['failures']} failures.")
+            # A failed trial request re-arms the cooldown
+            breaker["opened_at"] = time.monotonic()
+            breaker["trial_at"] = None
+
+
+def http_get(url, report=None, stream=False):
+    """
+    GET a DAMAS URL over the shared session, retrying transient failures.
+
+    Timeouts, connection errors, 429 and 5xx answers are retried up to
+    RETRY_ATTEMPTS times with full-jitter exponential backoff. When report
+    is given, its circuit breaker is checked first and updated afterwards.
+    Other HTTP errors are returned to the caller untouched.
+    """
+    report = report or url
+    if not breaker_allows(report):
+        raise CircuitOpenError(f"Circuit breaker open for {report}")
+
+    last_error = None
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            response = get_session().get(url, timeout=REQUEST_TIMEOUT, stream=stream)
+            if response.status_code == 429 or response.status_code >= 500:
+                response.close()
+                raise requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+            record_request_outcome(report, ok=True)
+            return response
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+            last_error = e
+            if attempt < RETRY_ATTEMPTS - 1:
+                time.sleep(random.uniform(0, RETRY_BACKOFF_SECONDS * 2 ** attempt))
+
+    record_request_outcome(report, ok=False)
+    raise last_error
+
+
+def format_api_time(ts):
+    """Format an aware datetime the way the DAMAS timeInterval parameters expect (UTC)."""
+    return ts.astimezone(pytz.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def parse_api_time(value):
+    """Parse a DAMAS timeInterval bound ('...Z') into an aware UTC datetime."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def items_to_frame(items, fields):
+    """
+    Turn a DAMAS itemList into columns in one vectorized pass.
+
+    Returns a frame with "from" / "to" as tz-aware Europe/Bucharest timestamps
+    and one float column per requested field (missing or null values -> 0.0).
+    Items without a parseable interval start are dropped.
+    """
+    if not items:
+        return pd.DataFrame(columns=["from", "to", *fields])
+
+    raw = pd.json_normalize(items)
+    if "timeInterval.from" not in raw.columns:
+        print("⚠️ No items with a valid interval start.")
+        return pd.DataFrame(columns=["from", "to", *fields])
+
+    # ISO8601 parses each bound on its own, so items mixing "Z" and "+02:00"
+    # or carrying fractional seconds are not coerced to NaT
+    to = raw["timeInterval.to"] if "timeInterval.to" in raw.columns else pd.Series(None, index=raw.index, dtype="object")
+    frame = pd.DataFrame({
+        "from": pd.to_datetime(raw["timeInterval.from"], utc=True, errors="coerce", format="ISO8601").dt.tz_convert(eet_timezone),
+        "to": pd.to_datetime(to, utc=True, errors="coerce", format="ISO8601").dt.tz_convert(eet_timezone),
+    })
+    for field in fields:
+        if field in raw.columns:
+            frame[field] = pd.to_numeric(raw[field], errors="coerce").fillna(0.0).astype(float)
+        else:
+            frame[field] = 0.0
+
+    dropped = frame["from"].isna().sum()
+    if dropped:
+        print(f"⚠️ Dropped {dropped} items without a valid interval start.")
+        frame = frame[frame["from"].notna()]
+    return frame
+
+
+def format_time_period(index):
+    """Format "YYYY-mm-dd HH:MM:SS - YYYY-mm-dd HH:MM:SS" labels for an interval start index."""
+    fmt = "%Y-%m-%d %H:%M:%S"
+    return index.strftime(fmt) + " - " + (index + INTERVAL).strftime(fmt)
+
+
+def empty_frame(columns):
+    """Canonical frame without rows: empty interval index, float columns."""
+    index = pd.DatetimeIndex([], tz=eet_timezone, name=INTERVAL_INDEX)
+    return pd.DataFrame({column: pd.Series(dtype="float64") for column in columns}, index=index)
+
+
+@lru_cache(maxsize=64)
+def day_grid(day):
+    """Interval starts of one EET day: 96 quarter-hours, 92 on the spring and 100 on the autumn DST day."""
+    start, end = (bound.astimezone(pytz.utc) for bound in day_bounds(day))
+    grid = pd.date_range(start, end, freq=INTERVAL, inclusive="left").tz_convert(eet_timezone)
+    return grid.rename(INTERVAL_INDEX)
+
+
+def align_reports(frames, day=None, trim=True):
+    """
+    Put canonical frames side by side on the interval grid of an EET day (today by default).
+
+    Each frame is reindexed onto the same grid, so the result is assembled
+    without any join. Intervals no frame has are NaN; with trim, the grid
+    stops at the last interval any frame has.
+    """
+    frames = list(frames)
+    if day is None:
+        _, eet_midnight = today_bounds()
+        day = eet_midnight.date()
+
+    grid = day_grid(day)
+    if trim:
+        last = max((df.index.max() for df in frames if not df.empty), default=None)
+        grid = grid[:grid.searchsorted(last, side="right")] if last is not None else grid[:0]
+    return pd.concat([df.reindex(grid) for df in frames], axis=1)
+
+
+def display_frame(df, key="period"):
+    """
+    Turn a canonical frame into the table the pages show.
+
+    key "period" puts a "Time Period (EET)" label first; key "timestamp"
+    puts the naive EET interval end as "Timestamp".
+    """
+    if key == "period":
+        label = pd.Index(format_time_period(df.index), name="Time Period (EET)")
+    else:
+        label = pd.Index((df.index + INTERVAL).tz_localize(None), name="Timestamp")
+    return df.set_axis(label).reset_index()
+
+
+def report_url(report, utc_from, utc_to, page=None):
+    """Build the publicReport URL of one DAMAS report for [utc_from, utc_to), optionally for one page."""
+    url = (
+        f"{DAMAS_REPORT_URL}{report}"
+        f"?timeInterval.from={format_api_time(utc_from)}&timeInterval.to={format_api_time(utc_to)}"
+        f"&pageInfo.pageSize={PAGE_SIZE}"
+    )
+    if page is not None:
+        url += f"&pageInfo.pageNumber={page}"
+    return url
+
+
+def read_page_info(payload, page_size=PAGE_SIZE):
+    """
+    Read the paging metadata of a DAMAS response.
+
+    Returns (first page number, total pages), with total pages None when the
+    response carries neither a page count nor an item count.
+    """
+    info = payload.get("pageInfo") or {}
+    # A server that caps the page size says so in pageSize
+    page_size = int(info.get("pageSize") or page_size)
+    first_page = int(info.get("pageNumber", FIRST_PAGE_NUMBER) or FIRST_PAGE_NUMBER)
+
+    total_pages = info.get("totalPages") or info.get("pageCount")
+    if total_pages:
+        return first_page, int(total_pages)
+
+    total_items = (
+        info.get("totalItemCount") or info.get("totalItems")
+        or info.get("totalElements") or info.get("totalCount")
+    )
+    if total_items:
+        return first_page, -(-int(total_items) // page_size)
+    return first_page, None
+
+
+def fetch_report_page(report, utc_from, utc_to, page=None):
+    """Fetch one page of a DAMAS report and return the decoded JSON body."""
+    response = http_get(report_url(report, utc_from, utc_to, page=page), report=report)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_report_items(report, utc_from, utc_to):
+    """
+    Fetch the complete raw itemList of one DAMAS report for [utc_from, utc_to).
+
+    The first page tells how many pages there are; the remaining ones are
+    fetched concurrently and concatenated in page order. Without paging
+    metadata, pages are walked one by one while they come back full.
+
+    Raises requests.HTTPError on a non-200 answer and the usual
+    requests exceptions on timeouts or connection errors.
+    """
+    payload = fetch_report_page(report, utc_from, utc_to)
+    items = payload.get("itemList", [])
+    first_page, total_pages = read_page_info(payload)
+
+    if total_pages is not None and total_pages > 1:
+        pages = range(first_page + 1, first_page + total_pages)
+        print(f"📄 {report}: fetching {len(pages)} more pages concurrently.")
+        with ThreadPoolExecutor(max_workers=min(PAGE_FETCH_WORKERS, len(pages))) as pool:
+            bodies = pool.map(lambda page: fetch_report_page(report, utc_from, utc_to, page=page), pages)
+            for body in bodies:
+                items.extend(body.get("itemList", []))
+    elif total_pages is None:
+        page_items = items
+        page = first_page
+        while len(page_items) >= PAGE_SIZE:
+            page += 1
+            page_items = fetch_report_page(report, utc_from, utc_to, page=page).get("itemList", [])
+            items.extend(page_items)
+
+    return items
+
+
+def iter_report_item_chunks(report, utc_from, utc_to, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream one DAMAS report and yield its items in lists of at most chunk_size.
+
+    The response body is parsed incrementally with ijson, so memory stays
+    bounded by chunk_size whatever the requested window is. Pages are read
+    one after another, as many as the pageInfo of the answers announces
+    (pageInfo may come before or after itemList); without paging metadata,
+    while they come back full, like fetch_report_items.
+    """
+    import ijson
+
+    chunk = []
+    page = None
+    last_page = None
+    while True:
+        page_length = 0
+        info = {}
+        with http_get(report_url(report, utc_from, utc_to, page=page), report=report, stream=True) as response:
+            response.raise_for_status()
+            # Let urllib3 undo any gzip transfer encoding before ijson reads the bytes
+            response.raw.decode_content = True
+
+            builder = None
+            for prefix, event, value in ijson.parse(response.raw, use_float=True):
+                if prefix == "itemList.item" and event == "start_map":
+                    builder = ijson.ObjectBuilder()
+                if builder is not None:
+                    builder.event(event, value)
+                    if prefix == "itemList.item" and event == "end_map":
+                        page_length += 1
+                        chunk.append(builder.value)
+                        builder = None
+                        if len(chunk) >= chunk_size:
+                            yield chunk
+                            chunk = []
+                elif prefix.startswith("pageInfo.") and event in ("number", "string"):
+                    info[prefix.split(".", 1)[1]] = value
+
+        first_page, total_pages = read_page_info({"pageInfo": info})
+        if page is None:
+            page = first_page
+            if total_pages is not None:
+                last_page = first_page + total_pages - 1
+        if (page >= last_page) if last_page is not None else page_length < PAGE_SIZE:
+            break
+        page += 1
+
+    if chunk:
+        yield chunk
+
+
+def today_bounds():
+    """Return (EET now, EET midnight) for the current trading day."""
+    eet_now = datetime.now(eet_timezone)
+    eet_midnight = eet_timezone.localize(datetime(eet_now.year, eet_now.month, eet_now.day))
+    return eet_now, eet_midnight
+
+
+def day_bounds(day):
+    """Return the EET midnights starting and ending one EET calendar day (23, 24 or 25 hours apart)."""
+    next_day = day + timedelta(days=1)
+    return (
+        eet_timezone.localize(datetime(day.year, day.month, day.day)),
+        eet_timezone.localize(datetime(next_day.year, next_day.month, next_day.day)),
+    )
+
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD day given on the command line."""
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def fetch_day_items(report):
+    """
+    Return today's items for a report, fetching only what changed since the last poll.
+
+    The first call of the day requests the whole EET day (day_bounds: 23,
+    24 or 25 hours). Later calls request from DELTA_OVERLAP before the last
+    interval seen and merge the answer into the cached day, replacing
+    revised intervals. Items are returned sorted by interval start.
+    """
+    eet_now, eet_midnight = today_bounds()
+    utc_midnight, utc_end = (bound.astimezone(pytz.utc) for bound in day_bounds(eet_midnight.date()))
+
+    with _day_cache_lock:
+        cached = _day_cache.get(report)
+    if cached is None or cached["day"] != eet_midnight.date():
+        cached = {"day": eet_midnight.date(), "items": warm_start_items(report, utc_midnight, utc_end), "last_from": None}
+        seen = [key for key in cached["items"] if key <= eet_now]
+        cached["last_from"] = max(seen) if seen else None
+        with _day_cache_lock:
+            _day_cache[report] = cached
+
+    utc_start = utc_midnight
+    if cached["last_from"] is not None:
+        utc_start = max(utc_midnight, cached["last_from"] - DELTA_OVERLAP)
+
+    try:
+        items = fetch_report_items(report, utc_start, utc_end)
+    except requests.exceptions.RequestException as e:
+        # Stale-while-revalidate: keep serving the last good day while upstream is down
+        if not cached["items"]:
+            raise
+        with _breaker_lock:
+            since = _stale_since.setdefault(report, eet_now)
+        print(f"⚠️ {report}: serving {len(cached['items'])} cached intervals, upstream failing since {since:%H:%M:%S}: {e}")
+        return [cached["items"][key] for key in sorted(cached["items"])]
+
+    with _breaker_lock:
+        _stale_since.pop(report, None)
+    print(f"✅ {report}: fetched {len(items)} records from {format_api_time(utc_start)}.")
+
+    try:
+        store.save_items(report, items)
+    except Exception as e:
+        print(f"⚠️ {report}: could not write to the interval store: {e}")
+
+    merged = dict(cached["items"])
+    for item in items:
+        try:
+            merged[parse_api_time(item["timeInterval"]["from"])] = item
+        except Exception as e:
+            print(f"⚠️ {report}: skipping item without a valid interval: {e}")
+
+    # Never let the delta window start in the future, even if the report
+    # already carries placeholder rows for later intervals
+    seen = [key for key in merged if key <= eet_now]
+    cached = {
+        "day": eet_midnight.date(),
+        "items": merged,
+        "last_from": max(seen) if seen else None,
+    }
+    with _day_cache_lock:
+        _day_cache[report] = cached
+
+    return [merged[key] for key in sorted(merged)]
+
+
+def last_interval_seen(report):
+    """Return the start of the newest already started interval cached for a report today, or None."""
+    with _day_cache_lock:
+        cached = _day_cache.get(report)
+    return cached["last_from"] if cached else None
+
+
+def report_stale_since(report):
+    """Return when report started being served from cache (EET datetime), or None if it is fresh."""
+    with _breaker_lock:
+        return _stale_since.get(report)
+
+
+def mark_staleness(df, *reports):
+    """Flag df with the earliest stale_since of the reports it was built from."""
+    stale = [since for since in map(report_stale_since, reports) if since is not None]
+    df.attrs["stale_since"] = min(stale) if stale else None
+    return df
+
+
+def warm_start_items(report, utc_from, utc_to):
+    """Load the already stored items of a report for [utc_from, utc_to) (today), keyed by interval start."""
+    try:
+        items = store.load_items(report, utc_from, utc_to)
+    except Exception as e:
+        print(f"⚠️ {report}: could not read the interval store: {e}")
+        return {}
+
+    return {parse_api_time(item["timeInterval"]["from"]): item for item in items}
+
+
+def load_history_items(report, eet_from, eet_to):
+    """
+    Return stored items of a report between two EET datetimes, without a network call.
+
+    Feed the result to parse_report to get the same frame the live fetchers
+    produce, over as many days as the store holds.
+    """
+    return store.load_items(report, eet_from.astimezone(pytz.utc), eet_to.astimezone(pytz.utc))
+
+
+def iter_history_frames(report, eet_from, eet_to, fields=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Chunked counterpart of load_history_items + items_to_frame, for windows
+    too wide to hold in memory at once.
+
+    Yields frames of at most chunk_size rows, oldest first, with "from" /
+    "to" EET timestamps and one float column per field (by default every
+    field the registry reads from the report's endpoint).
+    """
+    fields = fields or endpoint_fields(report)
+    for items in store.iter_items(report, eet_from.astimezone(pytz.utc), eet_to.astimezone(pytz.utc), chunk_size):
+        yield items_to_frame(items, fields)
+
+
+# Report registry==================================================================================
+# Every dashboard report is a descriptor over one DAMAS endpoint. Reports that
+# share an endpoint are served from a single fetch per refresh.
+#
+#   endpoint       DAMAS publicReport name
+#   key            how display_frame labels the report: "period" ->
+#                  "Time Period (EET)", "timestamp" -> naive EET interval
+#                  end "Timestamp"
+#   columns        output column -> DAMAS fields summed into it
+#   from_midnight  drop intervals starting before EET midnight
+#   until_now      drop intervals starting at or after now
+REPORTS = {
+    "activation": {
+        "endpoint": "activatedBalancingEnergyOverview",
+        "key": "period",
+        "columns": {
+            "aFRR Up (MWh)": ["aFRR_Up"],
+            "aFRR Down (MWh)": ["aFRR_Down"],
+            "mFRR Up (MWh)": ["mFRR_Up"],
+            "mFRR Down (MWh)": ["mFRR_Down"],
+        },
+        "from_midnight": True,
+    },
+    "marginal_prices": {
+        "endpoint": "marginalPricesOverview",
+        "key": "period",
+        "columns": {
+            "aFRR Up Price (RON/MWh)": ["aFRR_Up"],
+            "aFRR Down Price (RON/MWh)": ["aFRR_Down"],
+            # mFRR Scheduled and Direct are combined into one price per direction
+            "mFRR Up Price (RON/MWh)": ["mFRR_Up_Scheduled", "mFRR_Up_Direct"],
+            "mFRR Down Price (RON/MWh)": ["mFRR_Down_Scheduled", "mFRR_Down_Direct"],
+        },
+    },
+    "imbalance_prices": {
+        "endpoint": "estimatedImbalancePrices",
+        "key": "timestamp",
+        "columns": {
+            "Imbalance Price Positive": ["estimatedPricePositiveImbalance"],
+            "Imbalance Price Negative": ["estimatedPriceNegativeImbalance"],
+        },
+        "until_now": True,
+    },
+    "imbalance_volumes": {
+        "endpoint": "estimatedPowerSystemImbalance",
+        "key": "timestamp",
+        # Can be positive (surplus) or negative (deficit)
+        "columns": {"Imbalance Volume": ["estimatedSystemImbalance"]},
+        "until_now": True,
+    },
+    "igcc": {
+        "endpoint": "estimatedPowerSystemImbalance",
+        "key": "timestamp",
+        # Read if present in the response, 0 otherwise
+        "columns": {
+            "IGCC Import (MW)": ["imbalanceNettingImport"],
+            "IGCC Export (MW)": ["imbalanceNettingExport"],
+        },
+        "until_now": True,
+    },
+    "unintended_deviation": {
+        "endpoint": "estimatedPowerSystemImbalance",
+        "key": "timestamp",
+        "columns": {
+            "Unintended_Import (MW)": ["estimatedUnintendedDeviationINArea"],
+            "Unintended_Export (MW)": ["estimatedUnintendedDeviationOUTArea"],
+        },
+    },
+}
+
+
+def endpoint_fields(endpoint):
+    """Every DAMAS field the registry's reports read from an endpoint, sorted."""
+    return sorted({
+        field
+        for spec in REPORTS.values() if spec["endpoint"] == endpoint
+        for sources in spec["columns"].values() for field in sources
+    })
+
+
+def report_columns(name):
+    """Return the value columns of a report."""
+    return list(REPORTS[name]["columns"])
+
+
+def parse_report(name, items, eet_midnight=None, utc_now=None):
+    """Turn the raw items of a report's endpoint into that report's canonical frame."""
+    spec = REPORTS[name]
+    columns = report_columns(name)
+    fields = sorted({field for sources in spec["columns"].values() for field in sources})
+
+    frame = items_to_frame(items, fields)
+    if spec.get("from_midnight") and eet_midnight is not None and not frame.empty:
+        frame = frame[frame["from"] >= eet_midnight]
+    if spec.get("until_now") and utc_now is not None and not frame.empty:
+        frame = frame[frame["from"] < utc_now]
+    if frame.empty:
+        print(f"⚠️ No valid {name} rows processed.")
+        return empty_frame(columns)
+
+    data = {column: frame[sources].sum(axis=1).to_numpy(dtype="float64") for column, sources in spec["columns"].items()}
+    df = pd.DataFrame(data, index=pd.DatetimeIndex(frame["from"], name=INTERVAL_INDEX), columns=columns)
+    # A revised interval appears twice when a cached day meets a fresh answer; keep the latest
+    df = df[~df.index.duplicated(keep="last")]
+    return df.sort_index()
+
+
+def fetch_endpoint_reports(endpoint, names):
+    """Fetch one endpoint once and build every named report on top of it."""
+    started = time.monotonic()
+    try:
+        items = fetch_day_items(endpoint)
+    except Exception as e:
+        print(f"❌ Request failed for {endpoint}: {e}")
+        items = []
+    print(f"⏱️ {endpoint}: {len(items)} intervals in {time.monotonic() - started:.2f}s")
+
+    _, eet_midnight = today_bounds()
+    utc_now = datetime.now(pytz.utc)
+    return {
+        name: mark_staleness(parse_report(name, items, eet_midnight=eet_midnight, utc_now=utc_now), endpoint)
+        for name in names
+    }
+
+
+def fetch_all_reports(names=None):
+    """
+    Fetch the given reports (all of REPORTS by default) at the same time.
+
+    Each endpoint is requested once, on its own worker thread, over the shared
+    session; reports sharing an endpoint are all parsed from that one answer.
+    Returns a dict report name -> DataFrame. A failing endpoint yields its last
+    good cached frames, or empty frames with the usual columns.
+    """
+    names = list(names or REPORTS)
+    by_endpoint = {}
+    for name in names:
+        by_endpoint.setdefault(REPORTS[name]["endpoint"], []).append(name)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(by_endpoint)) as pool:
+        futures = {endpoint: pool.submit(fetch_endpoint_reports, endpoint, group) for endpoint, group in by_endpoint.items()}
+        for endpoint, future in futures.items():
+            try:
+                results.update(future.result())
+            except Exception as e:
+                print(f"❌ Fetch failed for {endpoint}: {e}")
+                results.update({name: empty_frame(report_columns(name)) for name in by_endpoint[endpoint]})
+    return {name: results[name] for name in names}
+
+
+def load_stored_reports(names=None):
+    """
+    Build today's reports from the interval store only, without any DAMAS request.
+
+    This is how the dashboards read what the poller fetched; the frames are
+    the same ones fetch_all_reports returns.
+    """
+    names = list(names or REPORTS)
+    eet_now, eet_midnight = today_bounds()
+    _, eet_next_midnight = day_bounds(eet_midnight.date())
+    utc_now = eet_now.astimezone(pytz.utc)
+
+    items_by_endpoint = {}
+    reports = {}
+    for name in names:
+        endpoint = REPORTS[name]["endpoint"]
+        if endpoint not in items_by_endpoint:
+            try:
+                items_by_endpoint[endpoint] = load_history_items(endpoint, eet_midnight, eet_next_midnight)
+            except Exception as e:
+                print(f"⚠️ {endpoint}: could not read the interval store: {e}")
+                items_by_endpoint[endpoint] = []
+        reports[name] = parse_report(name, items_by_endpoint[endpoint], eet_midnight=eet_midnight, utc_now=utc_now)
+    return reports
@@ -0,0 +1,299 @@
+"""Local stand-in for the DAMAS publicReport API.
+
+Serves the four endpoints the dashboards use from JSON fixtures (or from
+deterministic synthetic data), with the same query parameters, itemList
+layout and pageInfo paging as the real service, plus optional latency and
+error injection. Point the fetch layer at it with DAMAS_BASE_URL to run the
+poller, the backfill or the dashboards offline and reproducibly.
+
+Record fixtures from the live API once (one JSON file per endpoint, each
+recorded day is added to it):
+    python damas_stub.py record 2025-03-12 --fixtures fixtures/damas
+
+fixtures/damas holds synthetic fixtures of the two DST days, 2025-03-30 (92
+intervals) and 2025-10-26 (100 intervals), made with record --synthesize.
+
+Serve them, re-dated to today, with 200 ms +- 100 ms latency and 5% errors:
+    python damas_stub.py serve --fixtures fixtures/damas --replay-as-today --latency 0.2 --jitter 0.1 --error-rate 0.05
+    DAMAS_BASE_URL=http://127.0.0.1:8765/publicReport/ python poller.py --once
+
+Without fixtures (--synthesize, or when the fixtures directory does not
+exist) every interval that has started gets repeatable pseudo-random
+values. Request counters are served at /__stats and reset with /__reset.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytz
+
+import damas
+
+# DAMAS fields served per endpoint
+ENDPOINT_FIELDS = {
+    "activatedBalancingEnergyOverview": ["aFRR_Up", "aFRR_Down", "mFRR_Up", "mFRR_Down"],
+    "marginalPricesOverview": [
+        "aFRR_Up", "aFRR_Down",
+        "mFRR_Up_Scheduled", "mFRR_Up_Direct", "mFRR_Down_Scheduled", "mFRR_Down_Direct",
+    ],
+    "estimatedImbalancePrices": ["estimatedPricePositiveImbalance", "estimatedPriceNegativeImbalance"],
+    "estimatedPowerSystemImbalance": [
+        "estimatedSystemImbalance", "imbalanceNettingImport", "imbalanceNettingExport",
+        "estimatedUnintendedDeviationINArea", "estimatedUnintendedDeviationOUTArea",
+    ],
+}
+
+# Value ranges of the synthetic data, by field name prefix
+SYNTHETIC_RANGES = {
+    "aFRR": (0, 60),
+    "mFRR": (0, 80),
+    "estimatedPrice": (-500, 2500),
+    "estimatedSystemImbalance": (-150, 150),
+    "imbalanceNetting": (0, 120),
+    "estimatedUnintendedDeviation": (0, 40),
+}
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "damas")
+
+eet_timezone = pytz.timezone("Europe/Bucharest")
+
+
+def load_fixtures(fixtures_dir, replay_as_today=False):
+    """
+    Load <endpoint>.json fixtures into endpoint -> [(interval start, item)], sorted.
+    Progress goes to stderr, so it stays out of output written to stdout (replay's CSV).
+
+    With replay_as_today, every endpoint is moved by whole days (EET wall
+    clock) so its first interval falls on today's EET date.
+    """
+    fixtures = {}
+    for endpoint in ENDPOINT_FIELDS:
+        path = os.path.join(fixtures_dir, f"{endpoint}.json")
+        if not os.path.exists(path):
+            print(f"⚠️ No fixture for {endpoint} at {path}; it will answer with an empty itemList.", file=sys.stderr)
+            fixtures[endpoint] = []
+            continue
+
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        items = payload.get("itemList", []) if isinstance(payload, dict) else payload
+        rows = sorted(((damas.parse_api_time(item["timeInterval"]["from"]), item) for item in items), key=lambda row: row[0])
+
+        if replay_as_today and rows:
+            days = (datetime.now(eet_timezone).date() - rows[0][0].astimezone(eet_timezone).date()).days
+            rows = [(shift_days(start, days), redate(item, days)) for start, item in rows]
+
+        fixtures[endpoint] = rows
+        print(f"📦 {endpoint}: {len(rows)} fixture intervals", file=sys.stderr)
+    return fixtures
+
+
+def shift_days(ts, days):
+    """Move ts by whole days on the EET wall clock, so quarter-hours keep their local time across DST."""
+    local = ts.astimezone(eet_timezone).replace(tzinfo=None) + timedelta(days=days)
+    return eet_timezone.localize(local).astimezone(pytz.utc)
+
+
+def redate(item, days):
+    """Return a copy of item with its time interval moved by whole EET days."""
+    interval = item["timeInterval"]
+    moved = {"from": damas.format_api_time(shift_days(damas.parse_api_time(interval["from"]), days))}
+    if interval.get("to"):
+        moved["to"] = damas.format_api_time(shift_days(damas.parse_api_time(interval["to"]), days))
+    return {**item, "timeInterval": moved}
+
+
+def synthesize_items(endpoint, utc_from, utc_to, until=None):
+    """Deterministic pseudo-random items for every quarter-hour in [utc_from, utc_to) that started before until."""
+    until = until or datetime.now(pytz.utc)
+    start = utc_from.replace(minute=utc_from.minute - utc_from.minute % 15, second=0, microsecond=0)
+    if start < utc_from:
+        start += timedelta(minutes=15)
+
+    items = []
+    while start < utc_to and start < until:
+        rnd = random.Random(f"{endpoint}/{damas.format_api_time(start)}")
+        item = {"timeInterval": {"from": damas.format_api_time(start), "to": damas.format_api_time(start + timedelta(minutes=15))}}
+        for field in ENDPOINT_FIELDS[endpoint]:
+            low, high = next(bounds for prefix, bounds in SYNTHETIC_RANGES.items() if field.startswith(prefix))
+            item[field] = round(rnd.uniform(low, high), 3)
+        items.append(item)
+        start += timedelta(minutes=15)
+    return items
+
+
+class StubState:
+    """Configuration and counters shared by the request handler threads."""
+
+    def __init__(self, fixtures=None, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503,
+                 max_page_size=None, seed=None):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_page_size = max_page_size
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def count(self, endpoint, outcome):
+        with self.lock:
+            counters = self.stats.setdefault(endpoint, {"requests": 0, "errors": 0, "items": 0})
+            counters["requests"] += 1
+            counters[outcome[0]] += outcome[1]
+
+    def items(self, endpoint, utc_from, utc_to):
+        if self.fixtures is None:
+            return synthesize_items(endpoint, utc_from, utc_to)
+        return [item for start, item in self.fixtures.get(endpoint, []) if utc_from <= start < utc_to]
+
+
+def make_handler(state):
+    class DamasStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/__stats":
+                with state.lock:
+                    return self.send_json(200, state.stats)
+            if url.path == "/__reset":
+                with state.lock:
+                    state.stats.clear()
+                return self.send_json(200, {})
+
+            endpoint = url.path.rstrip("/").rsplit("/", 1)[-1]
+            if endpoint not in ENDPOINT_FIELDS:
+                return self.send_json(404, {"error": f"unknown report {endpoint}"})
+
+            with state.lock:
+                delay = max(0.0, state.latency + state.random.uniform(-state.jitter, state.jitter))
+                fail = state.random.random() < state.error_rate
+            time.sleep(delay)
+            if fail:
+                state.count(endpoint, ("errors", 1))
+                return self.send_json(state.error_status, {"error": "injected failure"})
+
+            query = parse_qs(url.query)
+            try:
+                utc_from = damas.parse_api_time(query["timeInterval.from"][0])
+                utc_to = damas.parse_api_time(query["timeInterval.to"][0])
+                page_size = int(query.get("pageInfo.pageSize", [3000])[0])
+                page = int(query.get("pageInfo.pageNumber", [0])[0])
+            except (KeyError, ValueError) as e:
+                return self.send_json(400, {"error": f"bad query: {e}"})
+
+            if state.max_page_size:
+                page_size = min(page_size, state.max_page_size)
+            items = state.items(endpoint, utc_from, utc_to)
+            page_items = items[page * page_size:(page + 1) * page_size]
+            state.count(endpoint, ("items", len(page_items)))
+            self.send_json(200, {
+                "itemList": page_items,
+                "pageInfo": {
+                    "pageNumber": page,
+                    "pageSize": page_size,
+                    "totalPages": max(1, -(-len(items) // page_size)),
+                    "totalItemCount": len(items),
+                },
+            })
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            if os.getenv("DAMAS_STUB_VERBOSE"):
+                super().log_message(format, *args)
+
+    return DamasStubHandler
+
+
+def start_server(state, host="127.0.0.1", port=8765):
+    """Start the stub on a background thread; returns the server (call shutdown() to stop it)."""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def base_url(server):
+    """DAMAS_BASE_URL value that targets a running stub."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/publicReport/"
+
+
+def record(day, fixtures_dir, synthesize=False):
+    """
+    Fetch one EET day of every endpoint from the live API (or synthesize it)
+    and add it to the fixtures, replacing intervals recorded before.
+    """
+    os.makedirs(fixtures_dir, exist_ok=True)
+    utc_from, utc_to = (bound.astimezone(pytz.utc) for bound in damas.day_bounds(day))
+    for endpoint in ENDPOINT_FIELDS:
+        if synthesize:
+            items = synthesize_items(endpoint, utc_from, utc_to)
+        else:
+            items = damas.fetch_report_items(endpoint, utc_from, utc_to)
+
+        path = os.path.join(fixtures_dir, f"{endpoint}.json")
+        recorded = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                recorded = {item["timeInterval"]["from"]: item for item in json.load(f).get("itemList", [])}
+        recorded.update((item["timeInterval"]["from"], item) for item in items)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"itemList": sorted(recorded.values(), key=lambda item: damas.parse_api_time(item["timeInterval"]["from"]))}, f, indent=1)
+        print(f"💾 {endpoint}: {len(items)} intervals -> {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the DAMAS publicReport API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Serve fixtures or synthetic data")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR, help="Directory with <endpoint>.json fixtures")
+    serve.add_argument("--synthesize", action="store_true", help="Serve synthetic data instead of fixtures")
+    serve.add_argument("--replay-as-today", action="store_true", help="Move fixtures by whole days onto today")
+    serve.add_argument("--latency", type=float, default=0.0, help="Seconds added to every answer")
+    serve.add_argument("--jitter", type=float, default=0.0, help="Random +- seconds around --latency")
+    serve.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with --error-status")
+    serve.add_argument("--error-status", type=int, default=503)
+    serve.add_argument("--max-page-size", type=int, default=None, help="Cap the page size to exercise paging")
+    serve.add_argument("--seed", type=int, default=None, help="Seed for latency and error injection")
+
+    rec = commands.add_parser("record", help="Record one day of the live API as fixtures")
+    rec.add_argument("day", type=damas.parse_day, help="EET day (YYYY-MM-DD)")
+    rec.add_argument("--fixtures", default=DEFAULT_FIXTURES_DIR)
+    rec.add_argument("--synthesize", action="store_true", help="Record synthetic data instead of the live API")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.day, args.fixtures, args.synthesize)
+    else:
+        if not args.synthesize and not os.path.isdir(args.fixtures):
+            print(f"⚠️ No fixtures directory at {args.fixtures}; serving synthetic data.")
+            args.synthesize = True
+        fixtures = None if args.synthesize else load_fixtures(args.fixtures, args.replay_as_today)
+        state = StubState(fixtures, args.latency, args.jitter, args.error_rate, args.error_status,
+                          args.max_page_size, args.seed)
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+        print(f"🧪 DAMAS stub listening, use DAMAS_BASE_URL=http://{args.host}:{args.port}/publicReport/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,274 @@
+"""ENTSO-E Transparency Platform source for the Romanian imbalance data.
+
+Documents come back from the API as XML, or as a zip of XML files for larger
+requests. Both are parsed with ``ElementTree.iterparse`` and every element
+is cleared as soon as it has been read, so memory stays flat whatever the
+size of the document. The response body is spooled to a temporary file
+rather than held in memory.
+
+Parsed points are cached in the interval store (under "entsoe:<document>")
+as DAMAS-shaped items, so a finished day is only downloaded once. Frames are
+canonical like the damas.py reports (tz-aware EET interval start index,
+float columns) and join directly with them.
+
+Works offline on the bundled sample archives:
+    python entsoe.py import imbalance_prices imbalance_prices_response.zip
+    python entsoe.py import imbalance_volumes entsoe_response.zip
+Downloads need API_KEY_ENTSOE:
+    python entsoe.py fetch imbalance_prices 2025-04-29
+"""
+import argparse
+import os
+import re
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+import pandas as pd
+import pytz
+from dotenv import load_dotenv
+
+import damas
+import store
+
+load_dotenv()
+API_KEY_ENTSOE = os.getenv("API_KEY_ENTSOE")
+
+ENTSOE_API_URL = os.getenv("ENTSOE_API_URL", "https://web-api.tp.entsoe.eu/api")
+
+# Romanian control area (Transelectrica)
+ROMANIA_DOMAIN = "10YRO-TEL------P"
+
+# Body bytes kept in memory before the spooled response moves to disk
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Every supported document type. Each point belongs to one output column,
+# chosen by a code read either from its TimeSeries (series_field) or from
+# the point itself (point_field).
+#
+#   params       extra API query parameters
+#   value_field  Point child holding the number
+#   codes        code -> output column
+DOCUMENTS = {
+    "imbalance_volumes": {
+        "params": {"documentType": "A86", "businessType": "A19", "controlArea_Domain": ROMANIA_DOMAIN},
+        "series_field": "flowDirection.direction",
+        "value_field": "quantity",
+        "codes": {
+            "A01": "ENTSO-E Imbalance Up (MWh)",
+            "A02": "ENTSO-E Imbalance Down (MWh)",
+        },
+    },
+    "imbalance_prices": {
+        "params": {"documentType": "A85", "controlArea_Domain": ROMANIA_DOMAIN},
+        "point_field": "imbalance_Price.category",
+        "value_field": "imbalance_Price.amount",
+        "codes": {
+            "A04": "ENTSO-E Imbalance Price Excess (RON/MWh)",
+            "A05": "ENTSO-E Imbalance Price Deficit (RON/MWh)",
+        },
+    },
+}
+
+eet_timezone = pytz.timezone("Europe/Bucharest")
+
+
+def store_report(name):
+    """Name the ENTSO-E document is cached under in the interval store."""
+    return f"entsoe:{name}"
+
+
+def parse_resolution(value):
+    """Turn an ISO 8601 resolution such as PT15M or PT1H into a timedelta."""
+    match = re.fullmatch(r"PT(?:(\d+)H)?(?:(\d+)M)?", value.strip())
+    if not match or not any(match.groups()):
+        raise ValueError(f"Unsupported resolution {value!r}")
+    return timedelta(hours=int(match.group(1) or 0), minutes=int(match.group(2) or 0))
+
+
+def parse_entsoe_time(value):
+    """Parse ENTSO-E timestamps such as 2025-04-28T21:00Z."""
+    return datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+
+
+def iter_points(xml_file, name):
+    """
+    Stream (interval start UTC, interval end UTC, column, value) out of one XML document.
+
+    Elements are cleared as soon as they are consumed. An acknowledgement
+    document (ENTSO-E's answer when there is no data) yields nothing.
+    """
+    spec = DOCUMENTS[name]
+    codes = spec["codes"]
+    series_code = period_start = resolution = None
+    point = {}
+    path = []
+
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        tag = elem.tag.rsplit("}", 1)[-1]
+        if event == "start":
+            path.append(tag)
+            if tag == "TimeSeries":
+                series_code = None
+            elif tag == "Point":
+                point = {}
+            continue
+
+        path.pop()
+        parent = path[-1] if path else None
+        if tag == "text" and parent == "Reason":
+            print(f"ℹ️ ENTSO-E {name}: {elem.text}")
+        elif parent == "TimeSeries" and tag == spec.get("series_field"):
+            series_code = elem.text.strip()
+        elif parent == "timeInterval" and tag == "start" and "Period" in path:
+            period_start = parse_entsoe_time(elem.text)
+        elif parent == "Period" and tag == "resolution":
+            resolution = parse_resolution(elem.text)
+        elif parent == "Point":
+            point[tag] = elem.text
+        elif tag == "Point":
+            code = point.get(spec["point_field"], "").strip() if "point_field" in spec else series_code
+            column = codes.get(code)
+            if column is not None and period_start is not None and resolution is not None:
+                start = period_start + (int(point["position"]) - 1) * resolution
+                yield start, start + resolution, column, float(point[spec["value_field"]])
+            elem.clear()
+        elif tag in ("Period", "TimeSeries"):
+            elem.clear()
+
+
+def iter_document_points(source, name):
+    """Stream the points of a document given as a path or binary file, zipped or plain XML."""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for member in sorted(archive.namelist()):
+                if member.lower().endswith(".xml"):
+                    with archive.open(member) as xml_file:
+                        yield from iter_points(xml_file, name)
+    else:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        yield from iter_points(source, name)
+
+
+def points_to_items(points):
+    """Fold points into DAMAS-shaped items, one per interval with every column seen for it."""
+    items = {}
+    for start, end, column, value in points:
+        item = items.setdefault(start, {"timeInterval": {"from": damas.format_api_time(start), "to": damas.format_api_time(end)}})
+        item[column] = value
+    return [items[start] for start in sorted(items)]
+
+
+def items_to_series_frame(name, items):
+    """Build the canonical ENTSO-E frame: EET interval start index plus one float column per code."""
+    columns = list(DOCUMENTS[name]["codes"].values())
+    if not items:
+        return damas.empty_frame(columns)
+
+    # Codes missing from an interval are unknown, so they stay NaN rather than 0
+    frame = pd.DataFrame.from_records([[item.get(column) for column in columns] for item in items], columns=columns)
+    frame = frame.astype("float64")
+    frame.index = pd.DatetimeIndex(
+        pd.to_datetime([item["timeInterval"]["from"] for item in items], utc=True).tz_convert(eet_timezone),
+        name=damas.INTERVAL_INDEX,
+    )
+    return frame.sort_index()
+
+
+def load_archive(path, name):
+    """Parse a saved ENTSO-E response (zip or XML) into a frame without touching the store."""
+    return items_to_series_frame(name, points_to_items(iter_document_points(path, name)))
+
+
+def import_archive(path, name):
+    """Parse a saved ENTSO-E response into the store; returns the number of intervals stored."""
+    items = points_to_items(iter_document_points(path, name))
+    return store.save_items(store_report(name), items)
+
+
+def fetch_document(name, utc_from, utc_to):
+    """Download one document for [utc_from, utc_to) and return its items."""
+    if not API_KEY_ENTSOE:
+        raise RuntimeError("API_KEY_ENTSOE is not set")
+
+    params = {
+        **DOCUMENTS[name]["params"],
+        "periodStart": utc_from.astimezone(pytz.utc).strftime("%Y%m%d%H%M"),
+        "periodEnd": utc_to.astimezone(pytz.utc).strftime("%Y%m%d%H%M"),
+        "securityToken": API_KEY_ENTSOE,
+    }
+    response = damas.http_get(f"{ENTSOE_API_URL}?{urlencode(params)}", report=store_report(name), stream=True)
+    with response, tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as body:
+        # ENTSO-E answers "no data" with a 400 and an acknowledgement document
+        if response.status_code not in (200, 400):
+            response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body.write(chunk)
+        body.seek(0)
+        return points_to_items(iter_document_points(body, name))
+
+
+def refresh_day(name, day):
+    """Download one EET day into the store unless it is already complete there; returns the items stored."""
+    report = store_report(name)
+    if day in store.backfilled_days(report):
+        return 0
+
+    utc_from, utc_to = (bound.astimezone(pytz.utc) for bound in damas.day_bounds(day))
+    items = fetch_document(name, utc_from, utc_to)
+    count = store.save_items(report, items)
+    if day < datetime.now(eet_timezone).date():
+        store.mark_backfilled(report, day, count)
+    print(f"✅ ENTSO-E {name}: stored {count} intervals for {day}.")
+    return count
+
+
+def load_series(name, eet_from, eet_to):
+    """Frame of the cached ENTSO-E document between two EET datetimes, without a network call."""
+    return items_to_series_frame(name, damas.load_history_items(store_report(name), eet_from, eet_to))
+
+
+def merge_on_grid(df, names=None, eet_from=None, eet_to=None):
+    """
+    Add cached ENTSO-E series to a canonical DAMAS frame, reindexed onto its interval index.
+
+    The window defaults to today (EET).
+    """
+    if eet_from is None or eet_to is None:
+        _, eet_midnight = damas.today_bounds()
+        eet_from, eet_to = damas.day_bounds(eet_midnight.date())
+
+    series = [load_series(name, eet_from, eet_to).reindex(df.index) for name in names or DOCUMENTS]
+    return pd.concat([df, *series], axis=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ENTSO-E imbalance data for Romania.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    imp = commands.add_parser("import", help="Load a saved response (zip or XML) into the store")
+    imp.add_argument("name", choices=DOCUMENTS)
+    imp.add_argument("path")
+
+    fetch = commands.add_parser("fetch", help="Download EET days into the store")
+    fetch.add_argument("name", choices=DOCUMENTS)
+    fetch.add_argument("start", type=damas.parse_day)
+    fetch.add_argument("end", type=damas.parse_day, nargs="?")
+
+    show = commands.add_parser("show", help="Print a saved response as a frame")
+    show.add_argument("name", choices=DOCUMENTS)
+    show.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        print(f"✅ Stored {import_archive(args.path, args.name)} intervals from {args.path}.")
+    elif args.command == "show":
+        print(damas.display_frame(load_archive(args.path, args.name), key="timestamp").to_string())
+    else:
+        day = args.start
+        while day <= (args.end or args.start):
+            refresh_day(args.name, day)
+            day += timedelta(days=1)
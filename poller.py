@@ -0,0 +1,424 @@
+"""Headless poller: fetches DAMAS, evaluates alarms and places the alarm calls.
+
+Runs on its own schedule, independent of any browser tab: by default the
+adaptive quarter-hour schedule of scheduler.py, which polls each endpoint
+densely around the time it usually publishes a new interval and rarely in
+between. Every poll it refreshes the due reports through damas.py (which
+writes the raw items to the interval store), evaluates the alarm rules on the
+aligned context of the fresh data (context.py) for every alarm profile,
+records new alarms in the store and calls each profile's phone number for
+every alarm no call was placed for yet, so calls missed by a restart or a
+failed call are placed on the next poll. The Streamlit pages only read the
+store (read_reports / read_alarms / read_heartbeat), so any number of open
+dashboards adds no upstream requests; the one thing they write is the alarm
+profiles (save_alarm_profile): a phone number and its thresholds, read back
+by the poller on every poll.
+
+Example:
+    python poller.py               # adaptive schedule
+    python poller.py --interval 60 # fixed interval
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from dotenv import load_dotenv
+
+import alarms
+import context
+import damas
+import entsoe
+import scheduler
+import store
+
+load_dotenv()
+
+# Seconds between two polls in fixed-interval mode
+POLL_INTERVAL_SECONDS = float(os.getenv("BM_POLL_INTERVAL_SECONDS", 60))
+
+# The dashboards flag the poller as down after this many poll intervals without a heartbeat
+HEARTBEAT_MISSED_POLLS = 3
+
+# Number the alarm calls go to (with country code) besides the profiles saved
+# from the dashboards, with the ALARM_<NAME> thresholds
+ALARM_PHONE_NUMBER = os.getenv("ALARM_PHONE_NUMBER", "").strip()
+
+# Twilio account configuration
+TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
+
+# Seconds between two refreshes of today's ENTSO-E documents (only with API_KEY_ENTSOE)
+ENTSOE_REFRESH_SECONDS = float(os.getenv("ENTSOE_REFRESH_SECONDS", 900))
+
+# Alarms about intervals that started this long ago are not called for any more
+CALL_RETRY_WINDOW = timedelta(hours=1)
+
+# Status names of the alarm profiles saved from the dashboards, one per phone number
+ALARM_PROFILE_PREFIX = "alarm_profile:"
+
+# Sidebar labels of the alarm thresholds
+THRESHOLD_LABELS = {
+    "THRESHOLD_AFRR_UP": "Threshold aFRR Up (MWh)",
+    "THRESHOLD_AFRR_DOWN": "Threshold aFRR Down (MWh)",
+    "THRESHOLD_MFRR_UP": "Threshold mFRR Up (MWh)",
+    "THRESHOLD_MFRR_DOWN": "Threshold mFRR Down (MWh)",
+    "RATE_OF_CHANGE_THRESHOLD": "Rate of Change Threshold (MWh)",
+    "AFRR_SPIKE_THRESHOLD": "aFRR Spike Threshold (MWh)",
+}
+
+eet_timezone = pytz.timezone("Europe/Bucharest")
+
+_twilio_client = None
+_entsoe_refreshed_at = None
+
+# Incremental alarm engine state (alarms.evaluate_new_profiles), as (thresholds
+# of every profile, state): after the first poll of the day only the intervals
+# that arrived since are evaluated, until a profile is added, removed or changed
+_alarm_state = (None, {})
+
+# (profile, key) pairs of the calls recorded for today (EET day, pair set), so
+# alarms raised again on every poll are dropped before they reach the store
+_call_keys = (None, set())
+
+
+def load_thresholds():
+    """Alarm thresholds: the defaults, overridden by ALARM_<NAME> environment variables."""
+    return {
+        name: float(os.getenv(f"ALARM_{name}") or default)
+        for name, default in alarms.DEFAULT_THRESHOLDS.items()
+    }
+
+
+def load_profiles():
+    """
+    The alarm profiles to evaluate, {name: {"phone_number", "thresholds"}}:
+    the ones saved from the dashboards, named by their phone number, plus
+    ALARM_PHONE_NUMBER with the load_thresholds thresholds when it is set or
+    no profile is saved (the alarms are then stored but not called for).
+    """
+    profiles = {}
+    for name, profile in store.list_status(ALARM_PROFILE_PREFIX).items():
+        phone_number = name[len(ALARM_PROFILE_PREFIX):]
+        profiles[phone_number] = {
+            "phone_number": phone_number,
+            "thresholds": {**alarms.DEFAULT_THRESHOLDS, **profile.get("thresholds", {})},
+        }
+    if ALARM_PHONE_NUMBER or not profiles:
+        profiles.setdefault(ALARM_PHONE_NUMBER or "default", {
+            "phone_number": ALARM_PHONE_NUMBER,
+            "thresholds": load_thresholds(),
+        })
+    return profiles
+
+
+def is_valid_phone_number(phone_number):
+    return phone_number.startswith("+") and len(phone_number) > 9
+
+
+def make_call(phone_number, alarm_type, alarm_message):
+    """Place a phone call for an alarm; returns True if the call was initiated."""
+    global _twilio_client
+    if not is_valid_phone_number(phone_number):
+        print(f"Invalid phone number: {phone_number!r}. Skipping call.")
+        return False
+
+    try:
+        if _twilio_client is None:
+            from twilio.rest import Client
+            _twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+
+        current_time_eet = datetime.now(eet_timezone).strftime("%Y-%m-%d %H:%M:%S")
+        call = _twilio_client.calls.create(
+            twiml=f'<Response><Say>{alarm_type} alarm: {alarm_message} detected at {current_time_eet}. Please check the system immediately.</Say></Response>',
+            to=phone_number,
+            from_=TWILIO_PHONE_NUMBER
+        )
+        print(f"{alarm_type} call initiated successfully! Call SID: {call.sid}")
+        return True
+
+    except Exception as e:
+        print(f"Error making the call: {e}")
+        return False
+
+
+def known_call_keys():
+    """(profile, key) pairs of today's recorded calls, read from the store once per EET day."""
+    global _call_keys
+    _, eet_midnight = damas.today_bounds()
+    if _call_keys[0] != eet_midnight.date():
+        _call_keys = (eet_midnight.date(), store.load_alarm_call_keys(since=eet_midnight))
+    return _call_keys[1]
+
+
+def evaluate_profiles(df, profiles):
+    """
+    Evaluate the alarm rules incrementally for every profile, in one
+    broadcast pass over all their thresholds (alarms.evaluate_new_profiles).
+
+    Returns ({profile: alarms}, {profile: catch-up time}): a profile that is
+    new (no call ever recorded for it, as in a new store) or whose thresholds
+    changed gets the epoch of the latest interval as catch-up time, the
+    alarms about earlier intervals being history rather than news. After a
+    restart the other profiles are called for what arrived while the poller
+    was down; the calls already recorded are not repeated (known_call_keys)
+    and CALL_RETRY_WINDOW bounds how far back they go.
+    """
+    global _alarm_state
+    thresholds = {name: profile["thresholds"] for name, profile in profiles.items()}
+    evaluated, state = _alarm_state
+    catch_up = {}
+    if evaluated != thresholds:
+        # Poller started or profiles changed from the dashboards: evaluate the whole day again
+        state = {}
+        _alarm_state = (thresholds, state)
+        if evaluated is None:
+            known = store.load_call_profiles()
+            new = [name for name in profiles if name not in known]
+        else:
+            new = [name for name in profiles if evaluated.get(name) != thresholds[name]]
+        if new and not df.empty:
+            catch_up = {name: df.index[-1].timestamp() for name in new}
+    return alarms.evaluate_new_profiles(df, state, thresholds), catch_up
+
+
+def record_alarms(raised, catch_up=None):
+    """
+    Store the alarms raised for each profile ({profile: alarms}) and the
+    calls they are due for, once per profile. Alarms about intervals before
+    the profile's catch-up time (see evaluate_profiles) are recorded with
+    their call skipped, so a new store, a new profile or changed thresholds
+    do not call for the whole day. Returns the alarms not stored before for any
+    profile.
+    """
+    catch_up = catch_up or {}
+    keys = known_call_keys()
+    fresh = {
+        profile: [alarm for alarm in profile_alarms if (profile, alarm.key) not in keys]
+        for profile, profile_alarms in raised.items()
+    }
+    new_alarms = store.save_alarms(list({
+        alarm.key: alarm for profile_alarms in fresh.values() for alarm in profile_alarms
+    }.values()))
+    for profile, profile_alarms in fresh.items():
+        since = catch_up.get(profile, float("-inf"))
+        past = [alarm for alarm in profile_alarms if alarm.alarm_time < since]
+        if past:
+            print(f"⏭️ {profile}: {len(past)} alarms about earlier intervals stored without calls.")
+            store.save_alarm_calls(profile, past, "skipped")
+        store.save_alarm_calls(profile, [alarm for alarm in profile_alarms if alarm.alarm_time >= since])
+        keys.update((profile, alarm.key) for alarm in profile_alarms)
+    return new_alarms
+
+
+def notify(profiles):
+    """
+    Call each profile's phone number for its alarms no call was placed for
+    yet. Alarms raised in the quiet hours of their rule (alarm_rules.json),
+    and those of profiles removed since, are skipped. A failed call is tried
+    again on the next polls, until its interval started CALL_RETRY_WINDOW ago.
+    """
+    pending = store.load_pending_calls(datetime.now(pytz.utc) - CALL_RETRY_WINDOW)
+    now = datetime.now(eet_timezone)
+    invalid = {}
+    for profile, *row in pending:
+        alarm = alarms.Alarm._make(row)
+        if profile not in profiles:
+            store.mark_alarm_notified(profile, alarm.key, "skipped")
+            continue
+        phone_number = profiles[profile]["phone_number"]
+        if not is_valid_phone_number(phone_number):
+            invalid[phone_number] = invalid.get(phone_number, 0) + 1
+            continue
+        if alarms.is_quiet(alarm.rule, now):
+            store.mark_alarm_notified(profile, alarm.key, "skipped")
+            continue
+        print(f"🔔 Calling {phone_number} for {alarm.alarm_type} Alarm: {alarm.message}")
+        if make_call(phone_number, alarm.alarm_type, alarm.message):
+            store.mark_alarm_notified(profile, alarm.key)
+
+    for phone_number, count in invalid.items():
+        print(f"Invalid phone number: {phone_number!r}. Skipping {count} calls.")
+
+
+def refresh_entsoe():
+    """Re-download today's ENTSO-E documents into the store, at most every ENTSOE_REFRESH_SECONDS."""
+    global _entsoe_refreshed_at
+    if not entsoe.API_KEY_ENTSOE:
+        return
+    if _entsoe_refreshed_at is not None and time.monotonic() - _entsoe_refreshed_at < ENTSOE_REFRESH_SECONDS:
+        return
+
+    _entsoe_refreshed_at = time.monotonic()
+    today = datetime.now(eet_timezone).date()
+    for name in entsoe.DOCUMENTS:
+        try:
+            entsoe.refresh_day(name, today)
+        except Exception as e:
+            print(f"❌ ENTSO-E {name} refresh failed: {e}")
+
+
+def report_endpoints():
+    """Every DAMAS endpoint behind the registry's reports."""
+    return sorted({spec["endpoint"] for spec in damas.REPORTS.values()})
+
+
+def poll_once(endpoints=None, schedule=None, interval_seconds=POLL_INTERVAL_SECONDS):
+    """
+    Run one poll: refresh the reports, evaluate alarms for the current alarm
+    profiles (load_profiles), publish status. Returns the new alarms.
+
+    Only the reports of the given endpoints (all by default) are fetched; the
+    others are rebuilt from the store. With a schedule, what the poll saw is
+    fed to the scheduler.
+    """
+    started = time.monotonic()
+    polled_at = datetime.now(pytz.utc)
+    endpoints = endpoints or report_endpoints()
+    due = [name for name, spec in damas.REPORTS.items() if spec["endpoint"] in endpoints]
+    rest = [name for name in damas.REPORTS if name not in due]
+    reports = {**damas.fetch_all_reports(due), **(damas.load_stored_reports(rest) if rest else {})}
+
+    stale_since, _ = store.get_status("stale_since")
+    stale_since = stale_since or {}
+    for name in due:
+        since = reports[name].attrs.get("stale_since")
+        if since is not None:
+            stale_since[name] = since.isoformat()
+        else:
+            stale_since.pop(name, None)
+    store.set_status("stale_since", stale_since)
+    refresh_entsoe()
+
+    ctx = context.build_context(reports)
+    profiles = load_profiles()
+    new_alarms = record_alarms(*evaluate_profiles(context.alarm_view(ctx), profiles))
+    for alarm in new_alarms:
+        print(f"Triggering {alarm.alarm_type} Alarm: {alarm.message}")
+    notify(profiles)
+
+    next_poll = None
+    if schedule is not None:
+        for endpoint in endpoints:
+            if scheduler.record_poll(schedule, endpoint, polled_at, damas.last_interval_seen(endpoint)):
+                print(f"🆕 New interval, {scheduler.describe(schedule, endpoint)}")
+        scheduler.save_state(schedule)
+        next_poll = min(scheduler.next_poll_at(schedule, endpoint, polled_at) for endpoint in report_endpoints())
+
+    store.set_status("heartbeat", {
+        "duration_seconds": round(time.monotonic() - started, 2),
+        "endpoints": list(endpoints),
+        "new_alarms": len(new_alarms),
+        "profiles": len(profiles),
+        "interval_seconds": interval_seconds,
+        "next_poll_at": next_poll.isoformat() if next_poll else None,
+    })
+    return new_alarms
+
+
+def run(interval_seconds=None):
+    """
+    Poll forever.
+
+    By default every endpoint is polled on the adaptive quarter-hour schedule
+    (scheduler.py); with interval_seconds all endpoints are polled at that
+    fixed interval instead.
+    """
+    if interval_seconds:
+        print(f"📡 Poller started: every {interval_seconds:.0f}s, store {store.STORE_PATH}")
+        while True:
+            started = time.monotonic()
+            try:
+                poll_once(interval_seconds=interval_seconds)
+            except Exception as e:
+                print(f"❌ Poll failed: {e}")
+            time.sleep(max(0.0, interval_seconds - (time.monotonic() - started)))
+
+    schedule = scheduler.load_state()
+    endpoints = report_endpoints()
+    print(f"📡 Poller started on the adaptive schedule, store {store.STORE_PATH}")
+    for endpoint in endpoints:
+        print(f"   {scheduler.describe(schedule, endpoint)}")
+
+    while True:
+        now = datetime.now(pytz.utc)
+        due = [endpoint for endpoint in endpoints if scheduler.next_poll_at(schedule, endpoint, now) <= now]
+        if due:
+            try:
+                poll_once(due, schedule, interval_seconds=scheduler.MAX_POLL_GAP_SECONDS)
+            except Exception as e:
+                print(f"❌ Poll failed: {e}")
+                # Do not retry the failed endpoints in a tight loop
+                for endpoint in due:
+                    schedule.setdefault(endpoint, {"samples": []})["last_poll"] = now.isoformat()
+
+        now = datetime.now(pytz.utc)
+        next_poll = min(scheduler.next_poll_at(schedule, endpoint, now) for endpoint in endpoints)
+        time.sleep(max(1.0, (next_poll - now).total_seconds()))
+
+
+# Read side, used by the Streamlit pages==========================================================
+def read_reports(names=None):
+    """Today's report frames as last fetched by the poller, flagged like fetch_all_reports does."""
+    reports = damas.load_stored_reports(names)
+    stale_since, _ = store.get_status("stale_since")
+    for name, df in reports.items():
+        since = (stale_since or {}).get(name)
+        df.attrs["stale_since"] = datetime.fromisoformat(since) if since else None
+    return reports
+
+
+def read_alarms():
+    """Alarms the poller raised about today's intervals, newest first."""
+    _, eet_midnight = damas.today_bounds()
+    return store.load_alarms(since=eet_midnight)
+
+
+def read_alarm_profile(phone_number):
+    """Return (thresholds, saved) of a phone number's alarm profile; the defaults when none is saved."""
+    profile, _ = store.get_status(ALARM_PROFILE_PREFIX + phone_number)
+    if profile is None:
+        return dict(alarms.DEFAULT_THRESHOLDS), False
+    return {**alarms.DEFAULT_THRESHOLDS, **profile.get("thresholds", {})}, True
+
+
+def save_alarm_profile(phone_number, thresholds):
+    """Save a phone number's alarm thresholds; the poller calls it from its next poll on."""
+    store.set_status(ALARM_PROFILE_PREFIX + phone_number, {"thresholds": thresholds})
+
+
+def delete_alarm_profile(phone_number):
+    """Stop the alarm calls to a phone number."""
+    store.delete_status(ALARM_PROFILE_PREFIX + phone_number)
+
+
+def seconds_until_next_poll(default=POLL_INTERVAL_SECONDS):
+    """Seconds until the poller's next scheduled poll, for pages that want to refresh right after it."""
+    beat, _ = store.get_status("heartbeat")
+    if not beat or not beat.get("next_poll_at"):
+        return default
+    return (datetime.fromisoformat(beat["next_poll_at"]) - datetime.now(pytz.utc)).total_seconds()
+
+
+def read_heartbeat():
+    """Return (last heartbeat as EET datetime or None, True if the poller looks alive)."""
+    beat, beat_at = store.get_status("heartbeat")
+    if beat_at is None:
+        return None, False
+    max_age = timedelta(seconds=HEARTBEAT_MISSED_POLLS * beat.get("interval_seconds", POLL_INTERVAL_SECONDS))
+    beat_at = beat_at.astimezone(eet_timezone)
+    return beat_at, datetime.now(eet_timezone) - beat_at <= max_age
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll DAMAS, evaluate balancing alarms and place alarm calls.")
+    parser.add_argument("--interval", type=float, default=None, help="Poll every endpoint at this fixed interval (seconds) instead of the adaptive schedule")
+    parser.add_argument("--once", action="store_true", help="Run a single poll and exit")
+    args = parser.parse_args()
+
+    if args.once:
+        poll_once()
+    else:
+        run(args.interval)
@@ -0,0 +1,211 @@
+"""Replay recorded days through the alarm engine on a simulated clock.
+
+Activation and marginal price intervals are released as if they were
+arriving live: each interval becomes visible --publish-delay seconds after
+it starts, and the alarm rules are evaluated every --tick simulated seconds
+on what is visible so far that day, exactly like the poller does. Every
+alarm is reported once, with its simulated fire time and its detection
+latency (fire time minus the publication of the interval it is about;
+negative for forward-looking alarms such as the missing mFRR update).
+
+The simulated clock runs --speed times faster than real time (0 = as fast as
+possible), so a month replays in minutes. Intervals come from the interval
+store by default (fill it with backfill.py) or from damas_stub fixtures.
+
+With --profile, several threshold profiles are replayed side by side in the
+same pass (alarms.evaluate_new_profiles) and every alarm is reported with
+the profile it fired for, to compare threshold settings on the same days.
+
+Example:
+    python replay.py 2025-03-01 2025-03-31 --speed 0 --out march_alarms.csv
+    python replay.py 2025-03-12 2025-03-12 --fixtures fixtures/damas --speed 1000 --threshold AFRR_SPIKE_THRESHOLD=40
+    python replay.py 2025-03-01 2025-03-31 --speed 0 --profile calm:AFRR_SPIKE_THRESHOLD=40,RATE_OF_CHANGE_THRESHOLD=30 --profile default:
+"""
+import argparse
+import bisect
+import csv
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+import alarms
+import damas
+
+ACTIVATION_ENDPOINT = damas.REPORTS["activation"]["endpoint"]
+PRICES_ENDPOINT = damas.REPORTS["marginal_prices"]["endpoint"]
+
+eet_timezone = pytz.timezone("Europe/Bucharest")
+
+
+def load_items_from_store(endpoint, eet_from, eet_to):
+    return damas.load_history_items(endpoint, eet_from, eet_to)
+
+
+def load_items_from_fixtures(fixtures_dir):
+    """Return a loader over damas_stub fixtures with the same signature as load_items_from_store."""
+    import damas_stub
+
+    fixtures = damas_stub.load_fixtures(fixtures_dir)
+
+    def load(endpoint, eet_from, eet_to):
+        return [item for start, item in fixtures.get(endpoint, []) if eet_from <= start < eet_to]
+    return load
+
+
+def released(items, publish_delay):
+    """Sort items by the time they become visible and return (publication times, items)."""
+    rows = sorted(
+        (damas.parse_api_time(item["timeInterval"]["from"]) + publish_delay, item) for item in items
+    ) if items else []
+    return [published for published, _ in rows], [item for _, item in rows]
+
+
+def replay_day(day, load_items, profiles, tick, publish_delay, speed, fired, on_alarm):
+    """
+    Replay one EET day for every threshold profile; (profile, alarm key)
+    pairs in fired are not reported again. Returns the number of evaluations.
+    """
+    eet_midnight, eet_next_midnight = damas.day_bounds(day)
+    activation_times, activation_items = released(load_items(ACTIVATION_ENDPOINT, eet_midnight, eet_next_midnight), publish_delay)
+    price_times, price_items = released(load_items(PRICES_ENDPOINT, eet_midnight, eet_next_midnight), publish_delay)
+
+    wall_start = time.monotonic()
+    visible = None
+    frame = None
+    # Incremental alarm state: each tick only evaluates the newly released intervals
+    state = {}
+    evaluations = 0
+    sim_now = eet_midnight
+    while sim_now < eet_next_midnight:
+        if speed:
+            time.sleep(max(0.0, wall_start + (sim_now - eet_midnight).total_seconds() / speed - time.monotonic()))
+
+        # Rebuild the frame only when a new interval was released
+        counts = (bisect.bisect_right(activation_times, sim_now), bisect.bisect_right(price_times, sim_now))
+        if counts != visible:
+            visible = counts
+            utc_now = sim_now.astimezone(pytz.utc)
+            # Nothing released yet around midnight: skip parse_report, which warns on stdout about empty reports
+            activation_df = damas.parse_report("activation", activation_items[:counts[0]], eet_midnight, utc_now) if counts[0] else damas.empty_frame(damas.report_columns("activation"))
+            price_df = damas.parse_report("marginal_prices", price_items[:counts[1]], eet_midnight, utc_now) if counts[1] else damas.empty_frame(damas.report_columns("marginal_prices"))
+            frame = activation_df
+            if not activation_df.empty and not price_df.empty:
+                frame = alarms.build_activation_frame(activation_df, price_df)
+
+        for profile, raised in alarms.evaluate_new_profiles(frame, state, profiles, now=sim_now).items():
+            for alarm in raised:
+                if (profile, alarm.key) not in fired:
+                    fired.add((profile, alarm.key))
+                    on_alarm(sim_now, alarm, profile)
+        evaluations += 1
+        sim_now = eet_timezone.normalize(sim_now + tick)
+    return evaluations
+
+
+def replay(start_day, end_day, load_items, thresholds=None, tick=timedelta(seconds=60),
+           publish_delay=timedelta(minutes=15), speed=1000.0, on_alarm=None, profiles=None):
+    """
+    Replay every EET day in [start_day, end_day] and return the fired alarms.
+
+    Each fired alarm is a dict with fire_time, alarm_time (EET datetimes),
+    alarm_type, rule, direction, message, latency_seconds and profile.
+    on_alarm, if given, is called with each one as soon as it fires.
+
+    profiles maps profile names to thresholds applied on top of thresholds;
+    without it there is a single profile named None.
+    """
+    results = []
+    fired = set()
+    profiles = {name: {**(thresholds or {}), **profile} for name, profile in (profiles or {None: {}}).items()}
+
+    def record(sim_now, alarm, profile):
+        alarm_time = datetime.fromtimestamp(alarm.alarm_time, eet_timezone)
+        result = {
+            "fire_time": sim_now,
+            "alarm_time": alarm_time,
+            "alarm_type": alarm.alarm_type,
+            "rule": alarm.rule,
+            "direction": alarm.direction,
+            "message": alarm.message,
+            "latency_seconds": (sim_now - (alarm_time + publish_delay)).total_seconds(),
+            "profile": profile,
+        }
+        results.append(result)
+        if on_alarm:
+            on_alarm(result)
+
+    started = time.monotonic()
+    evaluations = 0
+    day = start_day
+    while day <= end_day:
+        evaluations += replay_day(day, load_items, profiles, tick, publish_delay, speed, fired, record)
+        day += timedelta(days=1)
+
+    elapsed = time.monotonic() - started
+    latencies = sorted(result["latency_seconds"] for result in results if result["latency_seconds"] >= 0)
+    print(f"🔁 Replayed {(end_day - start_day).days + 1} days: {evaluations} evaluations, {len(results)} alarms "
+          f"in {elapsed:.1f}s ({evaluations / elapsed if elapsed else 0:.0f} evaluations/s)", file=sys.stderr)
+    if latencies:
+        print(f"⏱️ Detection latency: median {latencies[len(latencies) // 2]:.0f}s, "
+              f"p95 {latencies[int(len(latencies) * 0.95)]:.0f}s, max {latencies[-1]:.0f}s", file=sys.stderr)
+    if len(profiles) > 1:
+        for name in profiles:
+            count = sum(result["profile"] == name for result in results)
+            print(f"   {name}: {count} alarms, thresholds {profiles[name]}", file=sys.stderr)
+    return results
+
+
+def parse_threshold(value):
+    name, _, number = value.partition("=")
+    if name not in alarms.DEFAULT_THRESHOLDS or not number:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE with NAME one of {', '.join(alarms.DEFAULT_THRESHOLDS)}")
+    return name, float(number)
+
+
+def parse_profile(value):
+    profile, separator, thresholds = value.partition(":")
+    if not profile or not separator:
+        raise argparse.ArgumentTypeError("expected PROFILE:[NAME=VALUE,...]")
+    return profile, dict(parse_threshold(threshold) for threshold in thresholds.split(",") if threshold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded days through the alarm engine on a simulated clock.")
+    parser.add_argument("start", type=damas.parse_day, help="First EET day to replay (YYYY-MM-DD)")
+    parser.add_argument("end", type=damas.parse_day, help="Last EET day to replay, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--fixtures", help="Replay damas_stub fixtures from this directory instead of the store")
+    parser.add_argument("--speed", type=float, default=1000.0, help="Simulated seconds per real second (0 = as fast as possible)")
+    parser.add_argument("--tick", type=float, default=60.0, help="Simulated seconds between two alarm evaluations")
+    parser.add_argument("--publish-delay", type=float, default=900.0, help="Seconds after its start an interval becomes visible")
+    parser.add_argument("--threshold", type=parse_threshold, action="append", default=[], help="Override a threshold, e.g. AFRR_SPIKE_THRESHOLD=40")
+    parser.add_argument("--profile", type=parse_profile, action="append", default=[],
+                        help="Replay a named threshold profile, e.g. calm:AFRR_SPIKE_THRESHOLD=40 (repeatable)")
+    parser.add_argument("--out", help="Write the alarms to this CSV file instead of stdout")
+    args = parser.parse_args()
+
+    load_items = load_items_from_fixtures(args.fixtures) if args.fixtures else load_items_from_store
+    out = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    writer = csv.writer(out)
+    profile_column = ["profile"] if args.profile else []
+    writer.writerow([*profile_column, "fire_time", "alarm_time", "alarm_type", "latency_seconds", "message"])
+
+    def write(result):
+        writer.writerow([
+            *([result["profile"]] if args.profile else []),
+            result["fire_time"].isoformat(), result["alarm_time"].isoformat(),
+            result["alarm_type"], f"{result['latency_seconds']:.0f}", result["message"],
+        ])
+
+    replay(
+        args.start, args.end, load_items,
+        thresholds=dict(args.threshold),
+        tick=timedelta(seconds=args.tick),
+        publish_delay=timedelta(seconds=args.publish_delay),
+        speed=args.speed,
+        on_alarm=write,
+        profiles=dict(args.profile) or None,
+    )
+    if args.out:
+        out.close()
@@ -0,0 +1,154 @@
+"""Quarter-hour-aware polling schedule for the DAMAS endpoints.
+
+DAMAS publishes on the 15-minute imbalance settlement period grid, and each
+endpoint tends to publish a new interval at about the same offset after a
+quarter-hour boundary. The scheduler learns that offset per endpoint from
+what the poller observes: each time a poll sees a new interval, the span
+between the previous poll and this one (as seconds into the quarter-hour) is
+recorded as one sample.
+
+Endpoints are then polled every DENSE_POLL_SECONDS inside their learned
+publication window, and only every SPARSE_POLL_SECONDS outside it. Until an
+endpoint has MIN_SAMPLES samples it is polled every LEARNING_POLL_SECONDS,
+the old fixed refresh rate. The learned samples are kept in the store, so a
+restarted poller starts from what it learned before.
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytz
+
+import store
+
+QUARTER_SECONDS = 15 * 60
+
+# Poll spacing inside the publication window, outside it, while a window is
+# overdue (passed without a new interval) and before a window is learned
+DENSE_POLL_SECONDS = float(os.getenv("BM_DENSE_POLL_SECONDS", 10))
+SPARSE_POLL_SECONDS = float(os.getenv("BM_SPARSE_POLL_SECONDS", 180))
+OVERDUE_POLL_SECONDS = float(os.getenv("BM_OVERDUE_POLL_SECONDS", 30))
+LEARNING_POLL_SECONDS = float(os.getenv("BM_POLL_INTERVAL_SECONDS", 60))
+
+# Samples needed before an endpoint's window is trusted, and how many of the
+# most recent samples are kept (one day of quarter-hours)
+MIN_SAMPLES = 4
+MAX_SAMPLES = 96
+
+# Share of samples the window must cover, and slack added on both sides
+WINDOW_QUANTILE = 0.9
+WINDOW_MARGIN_SECONDS = 20
+
+# Store status entry holding the learned samples
+STATUS_NAME = "publish_schedule"
+
+# Longest gap the poller can leave between two polls of the same endpoint
+MAX_POLL_GAP_SECONDS = max(SPARSE_POLL_SECONDS, LEARNING_POLL_SECONDS)
+
+
+def quarter_start(ts):
+    """Return the quarter-hour boundary at or before ts."""
+    return ts.replace(minute=ts.minute - ts.minute % 15, second=0, microsecond=0)
+
+
+def quarter_offset(ts):
+    """Seconds elapsed since the quarter-hour boundary at or before ts."""
+    return (ts - quarter_start(ts)).total_seconds()
+
+
+def load_state():
+    """Return the learned schedule state: endpoint -> {"samples": [[lo, hi], ...], ...}."""
+    try:
+        state, _ = store.get_status(STATUS_NAME)
+    except Exception as e:
+        print(f"⚠️ Scheduler: could not read the learned schedule: {e}")
+        state = None
+    return state or {}
+
+
+def save_state(state):
+    try:
+        store.set_status(STATUS_NAME, state)
+    except Exception as e:
+        print(f"⚠️ Scheduler: could not save the learned schedule: {e}")
+
+
+def record_poll(state, endpoint, polled_at, latest_interval):
+    """
+    Record that endpoint was polled at polled_at and its newest interval starts at latest_interval.
+
+    When the newest interval moved forward since the last poll, the publication
+    happened between the two polls; that span, as quarter-hour offsets, becomes
+    a sample. Returns True if a new interval was seen.
+    """
+    entry = state.setdefault(endpoint, {"samples": []})
+    previous_interval = entry.get("latest_interval")
+    previous_poll = entry.get("last_poll")
+
+    latest_key = latest_interval.astimezone(pytz.utc).isoformat() if latest_interval is not None else None
+    entry["last_poll"] = polled_at.astimezone(pytz.utc).isoformat()
+    if latest_key is None or latest_key == previous_interval:
+        return False
+
+    entry["latest_interval"] = latest_key
+    entry["published_in"] = quarter_start(polled_at).astimezone(pytz.utc).isoformat()
+    if previous_interval is None or previous_poll is None:
+        # First sighting since (re)start: we cannot tell when it was published
+        return True
+
+    # Only the part of the span inside the current quarter-hour counts
+    previous_poll = datetime.fromisoformat(previous_poll)
+    lo = max(previous_poll, quarter_start(polled_at))
+    entry["samples"].append([quarter_offset(lo) if lo > quarter_start(polled_at) else 0.0, quarter_offset(polled_at)])
+    del entry["samples"][:-MAX_SAMPLES]
+    return True
+
+
+def publish_window(state, endpoint):
+    """Return the learned (start, end) publication window of endpoint in seconds after the quarter-hour, or None."""
+    samples = state.get(endpoint, {}).get("samples", [])
+    if len(samples) < MIN_SAMPLES:
+        return None
+
+    lows = sorted(lo for lo, _ in samples)
+    highs = sorted(hi for _, hi in samples)
+    cut = int(len(samples) * (1 - WINDOW_QUANTILE) / 2)
+    start = max(0.0, lows[cut] - WINDOW_MARGIN_SECONDS)
+    end = min(float(QUARTER_SECONDS), highs[len(highs) - 1 - cut] + WINDOW_MARGIN_SECONDS)
+    return start, end
+
+
+def next_poll_at(state, endpoint, now):
+    """Return when endpoint should be polled next."""
+    entry = state.get(endpoint, {})
+    last_poll = datetime.fromisoformat(entry["last_poll"]) if entry.get("last_poll") else None
+    if last_poll is None:
+        return now
+
+    window = publish_window(state, endpoint)
+    if window is None:
+        return last_poll + timedelta(seconds=LEARNING_POLL_SECONDS)
+
+    start, end = window
+    current_quarter = quarter_start(now)
+    window_start = current_quarter + timedelta(seconds=start)
+    window_end = current_quarter + timedelta(seconds=end)
+    next_window_start = window_start + timedelta(seconds=QUARTER_SECONDS)
+    published_this_quarter = entry.get("published_in") == current_quarter.astimezone(pytz.utc).isoformat()
+
+    if published_this_quarter or now < window_start:
+        # Nothing new expected before the (next) window opens
+        upcoming = next_window_start if published_this_quarter or now >= window_end else window_start
+        return min(last_poll + timedelta(seconds=SPARSE_POLL_SECONDS), upcoming)
+    if now <= window_end:
+        return last_poll + timedelta(seconds=DENSE_POLL_SECONDS)
+    # The window passed without a new interval: keep looking, less densely
+    return min(last_poll + timedelta(seconds=OVERDUE_POLL_SECONDS), next_window_start)
+
+
+def describe(state, endpoint):
+    """One-line summary of an endpoint's learned window, for the logs."""
+    window = publish_window(state, endpoint)
+    samples = len(state.get(endpoint, {}).get("samples", []))
+    if window is None:
+        return f"{endpoint}: learning ({samples}/{MIN_SAMPLES} samples)"
+    return f"{endpoint}: publishes {window[0]:.0f}-{window[1]:.0f}s after the quarter-hour ({samples} samples)"
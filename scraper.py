@@ -1,52 +1,335 @@
+"""Selenium scraper for the DAMAS activated balancing energy page.
+
+Browsers are expensive to start, so they are kept warm: a small pool of
+headless Chrome drivers stays on the page with the cookie popup already
+dismissed, and each call only re-reads the table. A page older than
+MAX_PAGE_AGE_SECONDS is reloaded in the same browser first. A driver that
+fails is quit and replaced by a fresh one on the next call.
+
+The table is read in a single script execution: the browser walks the
+virtualized grid, scrolling it when only part of the day is rendered, and
+hands back every row at once instead of one WebDriver round trip per cell.
+Saved snapshots (e.g. debug_page_source.html) go through the same row logic
+offline with parse_page_source:
+    python scraper.py debug_page_source.html
+"""
+import atexit
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import pandas as pd
+from bs4 import BeautifulSoup
 
-def get_latest_balancing_data():
-    # Initialize WebDriver
-    driver = webdriver.Chrome()
-    url = "https://newmarkets.transelectrica.ro/uu-webkit-maing02/00121011300000000000000000000100/activatedBalancingEnergyOverview"
+import damas
+
+DAMAS_PAGE_URL = "https://newmarkets.transelectrica.ro/uu-webkit-maing02/00121011300000000000000000000100/activatedBalancingEnergyOverview"
+
+# Number of warm browsers kept around (one per concurrent caller)
+DRIVER_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", 1))
+
+# Reload the page before reading when it was loaded longer ago than this
+MAX_PAGE_AGE_SECONDS = float(os.getenv("SCRAPER_MAX_PAGE_AGE_SECONDS", 60))
+
+# Seconds the in-page table extraction may take (scrolling included)
+SCRIPT_TIMEOUT_SECONDS = 30
+
+# Interval cells carry their label as title, e.g. "31. 1. 2025 16:00 - 31. 1. 2025 16:15".
+# The grid's class names are generated hashes that change between releases,
+# so rows are found from these labels rather than from a class.
+INTERVAL_TITLE = re.compile(r"^\d{1,2}\. ?\d{1,2}\. ?\d{4} \d{1,2}:\d{2} - ")
+INTERVAL_CSS = "[title*=':'][title*=' - ']"
+
+# Page columns -> dashboard columns
+TABLE_COLUMNS = {
+    "Time interval": "Time Period (EET)",
+    "FCR [MWh]": "FCR (MWh)",
+    "aFRR Up [MWh]": "aFRR Up (MWh)",
+    "aFRR Down [MWh]": "aFRR Down (MWh)",
+    "mFRR Up [MWh]": "mFRR Up (MWh)",
+    "mFRR Down [MWh]": "mFRR Down (MWh)",
+    "RR Up [MWh]": "RR Up (MWh)",
+    "RR Down [MWh]": "RR Down (MWh)",
+}
+
+# Collects {headers, rows} in one call. A row is the first ancestor of an
+# interval cell with at least three children; the grid only renders what is
+# in view, so its scroll container is stepped through and restored after.
+EXTRACT_TABLE_SCRIPT = r"""
+const done = arguments[arguments.length - 1];
+const INTERVAL = /^\d{1,2}\. ?\d{1,2}\. ?\d{4} \d{1,2}:\d{2} - /;
+
+const rowOf = (el) => { while (el && el.children.length < 3) el = el.parentElement; return el; };
+const cellValue = (cell) => {
+  const titled = cell.matches("[title]") ? cell : cell.querySelector("[title]");
+  return (titled ? titled.getAttribute("title") : cell.textContent).trim();
+};
+const intervalCells = () => Array.from(document.querySelectorAll("[title]"))
+  .filter((el) => INTERVAL.test(el.getAttribute("title")));
+
+// Keyed by grid position, so the repeated autumn DST hour keeps both rows
+const rows = new Map();
+const collect = () => {
+  for (const el of intervalCells()) {
+    const row = rowOf(el);
+    if (row) rows.set(`${row.style.top}|${el.getAttribute("title")}`,
+                      {top: parseFloat(row.style.top) || 0, cells: Array.from(row.children, cellValue)});
+  }
+};
+const ordered = () => Array.from(rows.values()).sort((a, b) => a.top - b.top).map((row) => row.cells);
+
+let headers = [];
+const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+while (walker.nextNode()) {
+  if (walker.currentNode.nodeValue.includes("[MWh]")) {
+    headers = Array.from(rowOf(walker.currentNode.parentElement).children, (cell) => cell.textContent.trim());
+    break;
+  }
+}
+
+let scroller = intervalCells()[0] || null;
+while (scroller && !(scroller.scrollHeight > scroller.clientHeight + 1
+                     && /auto|scroll/.test(getComputedStyle(scroller).overflowY))) {
+  scroller = scroller.parentElement;
+}
+
+(async () => {
+  collect();
+  if (scroller) {
+    const restore = scroller.scrollTop;
+    const step = Math.max(1, Math.floor(scroller.clientHeight * 0.8));
+    scroller.scrollTop = 0;
+    for (;;) {
+      await new Promise((resolve) => setTimeout(resolve, 50));
+      collect();
+      if (scroller.scrollTop + scroller.clientHeight >= scroller.scrollHeight - 1) break;
+      scroller.scrollTop += step;
+    }
+    scroller.scrollTop = restore;
+  }
+  done({headers: headers, rows: ordered()});
+})().catch((e) => done({headers: headers, rows: ordered(), error: String(e)}));
+"""
+
+# Idle warm drivers, each as {"driver": WebDriver, "loaded_at": monotonic time}
+_idle_drivers = queue.LifoQueue()
+_all_drivers = []
+_drivers_lock = threading.Lock()
+_drivers_available = threading.BoundedSemaphore(DRIVER_POOL_SIZE)
+
+
+def create_driver():
+    """Start a headless Chrome on the DAMAS page with the cookie popup dismissed."""
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--window-size=1600,1200")
+    driver = webdriver.Chrome(options=options)
+    driver.set_script_timeout(SCRIPT_TIMEOUT_SECONDS)
 
     try:
-        driver.get(url)
+        load_page(driver)
+    except Exception:
+        driver.quit()
+        raise
 
-        # Accept cookies if present
+    print("🌐 Started a warm scraper browser.")
+    return {"driver": driver, "loaded_at": time.monotonic()}
+
+
+def load_page(driver, reload=False):
+    """Open (or reload) the DAMAS page and wait for the table."""
+    if reload:
+        driver.refresh()
+    else:
+        driver.get(DAMAS_PAGE_URL)
+
+    # Accept cookies if present (only shown on the first visit of a browser)
+    if not reload:
         try:
             WebDriverWait(driver, 5).until(
                 EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'I understand')]"))
             ).click()
             print("Cookie accepted.")
-        except:
+        except Exception:
             print("No cookie popup detected.")
 
-        # Wait for the latest row to be present
-        latest_row = WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CLASS_NAME, "uutils-1p7r1e8"))
-        )
-
-        # Extract all divs inside the row
-        cells = latest_row.find_elements(By.TAG_NAME, "div")
-        if len(cells) >= 5:
-            # Extract the relevant data
-            time_period = cells[0].text.strip()
-            afrr_up = float(cells[1].text.strip() or 0)
-            afrr_down = float(cells[2].text.strip() or 0)
-            mfrr_up = float(cells[3].text.strip() or 0)
-            mfrr_down = float(cells[4].text.strip() or 0)
-
-            # Return as a single row DataFrame for simplicity
-            return pd.DataFrame([[time_period, afrr_up, afrr_down, mfrr_up, mfrr_down]],
-                                columns=["Time Period", "aFRR Up (MWh)", "aFRR Down (MWh)", "mFRR Up (MWh)", "mFRR Down (MWh)"])
-        else:
-            print("No data found in the latest row.")
-            return pd.DataFrame()  # Return empty DataFrame if no data
+    # Wait for the first interval row to be rendered
+    WebDriverWait(driver, 20).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, INTERVAL_CSS))
+    )
+
+
+def quit_driver(entry):
+    with _drivers_lock:
+        if entry in _all_drivers:
+            _all_drivers.remove(entry)
+    try:
+        entry["driver"].quit()
+    except Exception as e:
+        print(f"⚠️ Could not quit scraper browser: {e}")
+
+
+@contextmanager
+def warm_driver():
+    """
+    Borrow a warm driver whose page is at most MAX_PAGE_AGE_SECONDS old.
+
+    At most DRIVER_POOL_SIZE browsers exist; callers beyond that wait for a
+    free one. A driver that raises a WebDriverException (crash, timeout,
+    lost session) is quit instead of being returned, so the next caller
+    starts a fresh browser.
+    """
+    _drivers_available.acquire()
+    entry = None
+    try:
+        try:
+            entry = _idle_drivers.get_nowait()
+        except queue.Empty:
+            entry = create_driver()
+            with _drivers_lock:
+                _all_drivers.append(entry)
+
+        if time.monotonic() - entry["loaded_at"] > MAX_PAGE_AGE_SECONDS:
+            load_page(entry["driver"], reload=True)
+            entry["loaded_at"] = time.monotonic()
+
+        try:
+            yield entry["driver"]
+        except WebDriverException:
+            raise
+        except Exception:
+            # Not the browser's fault (e.g. an unexpected cell value): keep it warm
+            _idle_drivers.put(entry)
+            raise
+        _idle_drivers.put(entry)
+
+    except WebDriverException:
+        if entry is not None:
+            print("♻️ Scraper browser failed, it will be restarted on the next call.")
+            quit_driver(entry)
+        raise
 
     finally:
-        driver.quit()
+        _drivers_available.release()
+
+
+@atexit.register
+def shutdown_drivers():
+    """Quit every warm browser (run automatically at interpreter exit)."""
+    with _drivers_lock:
+        entries = list(_all_drivers)
+    for entry in entries:
+        quit_driver(entry)
+    while not _idle_drivers.empty():
+        _idle_drivers.get_nowait()
+
+
+def parse_page_source(html):
+    """
+    Read (headers, rows) out of a saved DAMAS page without a browser.
+
+    Same walk as EXTRACT_TABLE_SCRIPT, limited to the rows the snapshot had
+    rendered.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    def row_of(el):
+        while el is not None and len(el.find_all(recursive=False)) < 3:
+            el = el.parent
+        return el
+
+    def cell_value(cell):
+        titled = cell if cell.has_attr("title") else cell.find(attrs={"title": True})
+        return (titled["title"] if titled is not None else cell.get_text()).strip()
+
+    headers = []
+    label = soup.find(string=re.compile(r"\[MWh\]"))
+    if label is not None:
+        headers = [cell.get_text().strip() for cell in row_of(label.parent).find_all(recursive=False)]
+
+    rows = {}
+    for el in soup.find_all(attrs={"title": INTERVAL_TITLE}):
+        row = row_of(el)
+        if row is not None:
+            top = re.search(r"top:\s*([\d.]+)px", row.get("style", ""))
+            top = float(top.group(1)) if top else 0.0
+            rows[(top, el["title"])] = [cell_value(cell) for cell in row.find_all(recursive=False)]
+    return headers, [rows[key] for key in sorted(rows, key=lambda key: key[0])]
+
+
+def parse_page_time(value):
+    """Turn "31. 1. 2025 16:00" into a naive datetime."""
+    return datetime.strptime(re.sub(r"\.\s*", ".", value.strip()), "%d.%m.%Y %H:%M")
+
+
+def rows_to_frame(headers, rows):
+    """
+    Build the canonical scraped frame: EET interval start index (as the
+    damas.py reports) plus one float column per known volume column.
+    Empty cells mean nothing was activated and read as 0.
+    """
+    positions = {TABLE_COLUMNS[header]: i for i, header in enumerate(headers) if header in TABLE_COLUMNS}
+    columns = [column for column in TABLE_COLUMNS.values() if column in positions][1:]
+    if "Time Period (EET)" not in positions or not rows:
+        return damas.empty_frame(columns)
+
+    starts = [parse_page_time(row[positions["Time Period (EET)"]].split(" - ")[0]) for row in rows]
+    values = [[float(row[positions[column]] or 0) if positions[column] < len(row) else 0.0 for column in columns] for row in rows]
+
+    # Rows come in page order, so the repeated autumn DST hour can be told apart
+    try:
+        index = pd.DatetimeIndex(starts).tz_localize(damas.eet_timezone, ambiguous="infer", nonexistent="NaT")
+    except ValueError:
+        index = pd.DatetimeIndex(starts).tz_localize(damas.eet_timezone, ambiguous="NaT", nonexistent="NaT")
+    frame = pd.DataFrame(values, index=index.rename(damas.INTERVAL_INDEX), columns=columns, dtype="float64")
+    return frame[frame.index.notna()].sort_index()
+
+
+def get_balancing_table():
+    """Every interval the DAMAS page shows today, read in one script round trip."""
+    with warm_driver() as driver:
+        table = driver.execute_async_script(EXTRACT_TABLE_SCRIPT)
+    if table.get("error"):
+        print(f"⚠️ Table extraction stopped early: {table['error']}")
+    return rows_to_frame(table["headers"], table["rows"])
+
+
+def load_page_source(path):
+    """Frame of a saved DAMAS page (e.g. debug_page_source.html)."""
+    with open(path, encoding="utf-8") as f:
+        return rows_to_frame(*parse_page_source(f.read()))
+
+
+def get_latest_balancing_data():
+    """Newest interval of the DAMAS page as a single-row frame."""
+    df = get_balancing_table()
+    if df.empty:
+        print("No data found in the latest row.")
+        return pd.DataFrame()  # Return empty DataFrame if no data
+
+    latest = damas.display_frame(df.iloc[[-1]]).rename(columns={"Time Period (EET)": "Time Period"})
+    return latest[["Time Period", "aFRR Up (MWh)", "aFRR Down (MWh)", "mFRR Up (MWh)", "mFRR Down (MWh)"]]
 
 # Test the function
 if __name__ == "__main__":
-    df = get_latest_balancing_data()
-    print(df)
+    if len(sys.argv) > 1:
+        print(damas.display_frame(load_page_source(sys.argv[1])).to_string())
+        sys.exit()
+
+    for _ in range(3):
+        started = time.monotonic()
+        df = get_latest_balancing_data()
+        print(df)
+        print(f"⏱️ Sample read in {time.monotonic() - started:.2f}s")
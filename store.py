@@ -0,0 +1,309 @@
+"""Embedded on-disk interval store for the DAMAS reports (SQLite).
+
+Raw report items are kept as JSON, one row per (report, interval start), so
+every frame the dashboards build can be rebuilt from disk with the same
+parsers used for live data. The poller also records the alarms it raised and
+its status (heartbeat, stale reports) here. Alarms are keyed by Alarm.key
+(alarms.py), an integer hash of rule, interval and direction, and the calls
+are tracked per alarm profile (alarm_calls), so a restarted poller neither
+stores nor calls for an alarm twice, and picks up the calls it had not placed
+yet. The alarm profiles themselves (phone number and thresholds, saved from
+the dashboards) are status values. The database runs in WAL mode so
+the Streamlit pages can read while the poller is writing.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytz
+
+STORE_PATH = os.getenv("BM_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "bm_store.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_items (
+    report TEXT NOT NULL,
+    interval_start TEXT NOT NULL,
+    interval_end TEXT,
+    item TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (report, interval_start)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS backfill_progress (
+    report TEXT NOT NULL,
+    day TEXT NOT NULL,
+    item_count INTEGER NOT NULL,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (report, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS alarms (
+    key INTEGER PRIMARY KEY,
+    rule TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    alarm_time REAL NOT NULL,
+    message TEXT NOT NULL,
+    alarm_type TEXT NOT NULL,
+    raised_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS alarms_by_time ON alarms (alarm_time);
+
+CREATE TABLE IF NOT EXISTS alarm_calls (
+    profile TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    alarm_time REAL NOT NULL,
+    raised_at TEXT NOT NULL,
+    notified_at TEXT,
+    call_status TEXT,
+    PRIMARY KEY (profile, key)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS alarm_calls_pending ON alarm_calls (alarm_time) WHERE call_status IS NULL;
+
+CREATE TABLE IF NOT EXISTS status (
+    name TEXT PRIMARY KEY,
+    value TEXT,
+    updated_at TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# One connection per (thread, database path); sqlite3 connections must not be
+# shared across threads and the fetchers write from a thread pool
+_local = threading.local()
+
+
+def utc_key(ts):
+    """Format an aware datetime as the UTC text key used in the store (sorts chronologically)."""
+    return ts.astimezone(pytz.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_connection(path=None):
+    """Return this thread's connection to the store, creating the schema on first use."""
+    path = path or STORE_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        migrate_alarms(conn)
+        conn.executescript(SCHEMA)
+        connections[path] = conn
+    return conn
+
+
+def migrate_alarms(conn):
+    """
+    Move an alarms table of the message-keyed layout out of the way (to
+    alarms_v1), so the keyed one is created in its place.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(alarms)")]
+    if columns and "key" not in columns:
+        with conn:
+            conn.execute("DROP INDEX IF EXISTS alarms_by_time")
+            conn.execute("ALTER TABLE alarms RENAME TO alarms_v1")
+        print("ℹ️ Store: moved alarms without keys to alarms_v1.")
+
+
+def save_items(report, items, path=None):
+    """Insert or replace raw DAMAS items of one report, keyed by their interval start."""
+    fetched_at = utc_key(datetime.now(pytz.utc))
+    rows = []
+    for item in items:
+        try:
+            interval = item["timeInterval"]
+            start = datetime.fromisoformat(interval["from"].replace("Z", "+00:00"))
+            end = datetime.fromisoformat(interval["to"].replace("Z", "+00:00")) if interval.get("to") else None
+        except Exception as e:
+            print(f"⚠️ Store: skipping {report} item without a valid interval: {e}")
+            continue
+        rows.append((report, utc_key(start), utc_key(end) if end else None, json.dumps(item), fetched_at))
+
+    if not rows:
+        return 0
+
+    conn = get_connection(path)
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO report_items (report, interval_start, interval_end, item, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+    return len(rows)
+
+
+def load_items(report, utc_from, utc_to, path=None):
+    """Return the stored items of a report with interval start in [utc_from, utc_to), oldest first."""
+    conn = get_connection(path)
+    cursor = conn.execute(
+        "SELECT item FROM report_items WHERE report = ? AND interval_start >= ? AND interval_start < ? "
+        "ORDER BY interval_start",
+        (report, utc_key(utc_from), utc_key(utc_to)),
+    )
+    return [json.loads(row[0]) for row in cursor]
+
+
+def iter_items(report, utc_from, utc_to, chunk_size, path=None):
+    """load_items in lists of at most chunk_size items, read from the database as they are consumed."""
+    conn = get_connection(path)
+    cursor = conn.execute(
+        "SELECT item FROM report_items WHERE report = ? AND interval_start >= ? AND interval_start < ? "
+        "ORDER BY interval_start",
+        (report, utc_key(utc_from), utc_key(utc_to)),
+    )
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield [json.loads(row[0]) for row in rows]
+
+
+def mark_backfilled(report, day, item_count, path=None):
+    """Record that one EET day of a report has been fully backfilled."""
+    conn = get_connection(path)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO backfill_progress (report, day, item_count, completed_at) VALUES (?, ?, ?, ?)",
+            (report, day.isoformat(), item_count, utc_key(datetime.now(pytz.utc))),
+        )
+
+
+def backfilled_days(report, path=None):
+    """Return the set of EET dates already backfilled for a report."""
+    conn = get_connection(path)
+    cursor = conn.execute("SELECT day FROM backfill_progress WHERE report = ?", (report,))
+    return {datetime.strptime(row[0], "%Y-%m-%d").date() for row in cursor}
+
+
+def parse_utc_key(value):
+    """Inverse of utc_key: turn a stored UTC text key back into an aware datetime."""
+    return pytz.utc.localize(datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ"))
+
+
+def save_alarms(alarms, path=None):
+    """
+    Record alarms.Alarm tuples under their key, ignoring ones already stored.
+
+    Returns the alarms that were not stored before, in the order given.
+    """
+    raised_at = utc_key(datetime.now(pytz.utc))
+    conn = get_connection(path)
+    new_alarms = []
+    with conn:
+        for alarm in alarms:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO alarms (key, rule, direction, alarm_time, message, alarm_type, raised_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (alarm.key, alarm.rule, alarm.direction, alarm.alarm_time, alarm.message, alarm.alarm_type, raised_at),
+            )
+            if cursor.rowcount:
+                new_alarms.append(alarm)
+    return new_alarms
+
+
+def save_alarm_calls(profile, alarms, call_status=None, path=None):
+    """
+    Record that the calls for alarms.Alarm tuples (stored with save_alarms)
+    are due for an alarm profile, ignoring the ones already recorded. With a
+    call_status ("skipped") they are recorded as settled instead.
+    """
+    raised_at = utc_key(datetime.now(pytz.utc))
+    notified_at = raised_at if call_status else None
+    conn = get_connection(path)
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO alarm_calls (profile, key, alarm_time, raised_at, notified_at, call_status) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(profile, alarm.key, alarm.alarm_time, raised_at, notified_at, call_status) for alarm in alarms],
+        )
+
+
+def mark_alarm_notified(profile, key, call_status="placed", path=None):
+    """Record what became of a profile's call for an alarm: "placed", or "skipped" when none is due."""
+    conn = get_connection(path)
+    with conn:
+        conn.execute(
+            "UPDATE alarm_calls SET notified_at = ?, call_status = ? WHERE profile = ? AND key = ?",
+            (utc_key(datetime.now(pytz.utc)), call_status, profile, key),
+        )
+
+
+def load_alarm_call_keys(since=None, path=None):
+    """Return the (profile, key) pairs of the calls recorded for alarms about intervals from since on."""
+    conn = get_connection(path)
+    cursor = conn.execute(
+        "SELECT profile, key FROM alarm_calls WHERE alarm_time >= ?",
+        (since.timestamp() if since is not None else 0,),
+    )
+    return {tuple(row) for row in cursor}
+
+
+def load_call_profiles(path=None):
+    """Return the names of the alarm profiles any call was ever recorded for."""
+    conn = get_connection(path)
+    return {row[0] for row in conn.execute("SELECT DISTINCT profile FROM alarm_calls")}
+
+
+def load_pending_calls(since, path=None):
+    """
+    Return the calls for alarms about intervals from since on that were not
+    placed or skipped yet, oldest first, as (profile, alarm_time, message,
+    alarm_type, rule, direction) rows.
+    """
+    conn = get_connection(path)
+    cursor = conn.execute(
+        "SELECT c.profile, a.alarm_time, a.message, a.alarm_type, a.rule, a.direction "
+        "FROM alarm_calls c JOIN alarms a ON a.key = c.key "
+        "WHERE c.call_status IS NULL AND c.alarm_time >= ? ORDER BY c.alarm_time, c.raised_at",
+        (since.timestamp(),),
+    )
+    return [tuple(row) for row in cursor]
+
+
+def load_alarms(since=None, path=None):
+    """Return stored (alarm_time, message, alarm_type) alarms about intervals from since on, newest first."""
+    conn = get_connection(path)
+    cursor = conn.execute(
+        "SELECT alarm_time, message, alarm_type FROM alarms WHERE alarm_time >= ? ORDER BY alarm_time DESC",
+        (since.timestamp() if since is not None else 0,),
+    )
+    return [tuple(row) for row in cursor]
+
+
+def set_status(name, value, path=None):
+    """Store a named status value (JSON-serializable) with the current time."""
+    conn = get_connection(path)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO status (name, value, updated_at) VALUES (?, ?, ?)",
+            (name, json.dumps(value), utc_key(datetime.now(pytz.utc))),
+        )
+
+
+def get_status(name, path=None):
+    """Return (value, updated_at UTC datetime) of a named status, or (None, None) if never set."""
+    conn = get_connection(path)
+    row = conn.execute("SELECT value, updated_at FROM status WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None, None
+    return json.loads(row[0]), parse_utc_key(row[1])
+
+
+def list_status(prefix, path=None):
+    """Return {name: value} of the status values whose name starts with prefix."""
+    conn = get_connection(path)
+    cursor = conn.execute("SELECT name, value FROM status WHERE substr(name, 1, ?) = ?", (len(prefix), prefix))
+    return {name: json.loads(value) for name, value in cursor}
+
+
+def delete_status(name, path=None):
+    """Remove a named status value."""
+    conn = get_connection(path)
+    with conn:
+        conn.execute("DELETE FROM status WHERE name = ?", (name,))
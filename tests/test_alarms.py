@@ -0,0 +1,252 @@
+"""The vectorized alarm rules (alarm_rules.json) against the loop they replaced.
+
+reference_alarms is the per-row check_balancing_alarms loop the rule engine
+was ported from, kept here so edits to alarm_rules.json or to the
+expression compiler cannot change which alarms fire without a test failing.
+"""
+import copy
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import alarms  # noqa: E402
+
+eet_timezone = pytz.timezone("Europe/Bucharest")
+
+ACTIVATION_COLUMNS = ["mFRR Up (MWh)", "mFRR Down (MWh)", "aFRR Up (MWh)", "aFRR Down (MWh)"]
+
+# Ordinary days and both DST days (92 and 100 quarter-hours)
+DAYS = ["2025-01-15", "2025-03-30", "2025-06-01", "2025-07-01", "2025-10-26"]
+
+# The alarms about the clock rather than intervals, which depend on now
+CLOCK_RULES = {"no_data", "stale_data", "mfrr_update_missing"}
+
+
+def reference_alarms(df, thresholds=None, now=None):
+    """The original row-by-row alarm loop, returning (alarm_time, message, alarm_type) tuples."""
+    thresholds = {**alarms.DEFAULT_THRESHOLDS, **(thresholds or {})}
+    now = now.astimezone(eet_timezone)
+    result = []
+    raised = set()
+
+    def raise_alarm(alarm_time, message, alarm_type):
+        alarm = (alarm_time.timestamp(), message, alarm_type)
+        if alarm not in raised:
+            raised.add(alarm)
+            result.append(alarm)
+
+    if df.empty:
+        midnight = eet_timezone.localize(datetime(now.year, now.month, now.day))
+        if now - midnight > alarms.DATA_STALE_AFTER:
+            raise_alarm(midnight, f"🚨 Critical: No data available from the server on {now:%Y-%m-%d}.", "Critical")
+        return result
+
+    starts = df.index.to_pydatetime().tolist()
+    labels = df.index.strftime("%Y-%m-%d %H:%M").tolist()
+    values = df[ACTIVATION_COLUMNS].fillna(0).to_numpy().tolist()
+
+    latest_start = starts[-1]
+    latest_end = eet_timezone.normalize(latest_start + alarms.INTERVAL)
+    if now - latest_end > alarms.DATA_STALE_AFTER:
+        message = (f"🚨 Critical: No new data received for more than {alarms.DATA_STALE_AFTER.seconds // 60} minutes "
+                   f"(last update at {latest_end:%Y-%m-%d %H:%M:%S}).")
+        raise_alarm(latest_start, message, "Critical")
+
+    for i in range(1, len(df)):
+        at = labels[i]
+        start = starts[i]
+        mfrr_up, mfrr_down, afrr_up, afrr_down = values[i]
+        prev_mfrr_up, prev_mfrr_down, prev_afrr_up, prev_afrr_down = values[i - 1]
+
+        total_up, total_down = afrr_up + mfrr_up, afrr_down + mfrr_down
+        prev_total_up, prev_total_down = prev_afrr_up + prev_mfrr_up, prev_afrr_down + prev_mfrr_down
+
+        if prev_total_up > prev_total_down and total_down > total_up:
+            raise_alarm(start, f"🚨 Critical: System switched from upward total activation to downward total activation at {at}", "Critical")
+        if prev_total_down > prev_total_up and total_up > total_down:
+            raise_alarm(start, f"🚨 Critical: System switched from downward total activation to upward total activation at {at}", "Critical")
+
+        if mfrr_up < prev_mfrr_up and afrr_down > prev_afrr_down:
+            raise_alarm(start, f"⚠️ Warning: mFRR Up decreasing and aFRR Down increasing at {at}", "Warning")
+        if mfrr_down < prev_mfrr_down and afrr_up > prev_afrr_up:
+            raise_alarm(start, f"⚠️ Warning: mFRR Down decreasing and aFRR Up increasing at {at}", "Warning")
+
+        change_up = mfrr_up - prev_mfrr_up
+        change_down = mfrr_down - prev_mfrr_down
+        if abs(change_up) >= thresholds["RATE_OF_CHANGE_THRESHOLD"]:
+            if change_up > 0:
+                raise_alarm(start, f"⚠️ Warning: Sudden increase in mFRR Up by {change_up} MWh at {at}", "Warning")
+            else:
+                raise_alarm(start, f"⚠️ Warning: Sudden drop in mFRR Up by {abs(change_up)} MWh at {at}", "Warning")
+        if abs(change_down) >= thresholds["RATE_OF_CHANGE_THRESHOLD"]:
+            if change_down > 0:
+                raise_alarm(start, f"⚠️ Warning: Sudden increase in mFRR Down by {change_down} MWh at {at}", "Warning")
+            else:
+                raise_alarm(start, f"⚠️ Warning: Sudden drop in mFRR Down by {abs(change_down)} MWh at {at}", "Warning")
+
+        if prev_mfrr_up > 0 and mfrr_down > 0:
+            raise_alarm(start, f"🚨 Critical: System switched from deficit to surplus at {at}", "Critical")
+        if prev_mfrr_down > 0 and mfrr_up > 0:
+            raise_alarm(start, f"🚨 Critical: System switched from surplus to deficit at {at}", "Critical")
+
+        if prev_afrr_up > prev_afrr_down and prev_afrr_up > thresholds["THRESHOLD_AFRR_UP"]:
+            if afrr_down > prev_afrr_down and afrr_down > thresholds["THRESHOLD_AFRR_DOWN"]:
+                raise_alarm(start, f"🚨 Critical: Sudden spike in aFRR Down at {at}", "Critical")
+        if prev_afrr_down > prev_afrr_up and prev_afrr_down > thresholds["THRESHOLD_AFRR_DOWN"]:
+            if afrr_up > prev_afrr_up and afrr_up > thresholds["THRESHOLD_AFRR_UP"]:
+                raise_alarm(start, f"🚨 Critical: Sudden spike in aFRR Up at {at}", "Critical")
+
+        if prev_afrr_up > prev_afrr_down and afrr_down > afrr_up:
+            raise_alarm(start, f"⚠️ Warning: aFRR switched from Up to Down dominance at {at}", "Warning")
+        if prev_afrr_down > prev_afrr_up and afrr_up > afrr_down:
+            raise_alarm(start, f"⚠️ Warning: aFRR switched from Down to Up dominance at {at}", "Warning")
+
+        spike_up = abs(afrr_up - prev_afrr_up)
+        spike_down = abs(afrr_down - prev_afrr_down)
+        if spike_up >= thresholds["AFRR_SPIKE_THRESHOLD"]:
+            raise_alarm(start, f"🚨 Critical: Sudden large spike in aFRR Up by {spike_up} MWh at {at}", "Critical")
+        if spike_down >= thresholds["AFRR_SPIKE_THRESHOLD"]:
+            raise_alarm(start, f"🚨 Critical: Sudden large spike in aFRR Down by {spike_down} MWh at {at}", "Critical")
+
+    if len(df) >= 2:
+        expected_next_interval = latest_end
+        missing_time = (expected_next_interval - now).total_seconds() / 60
+        last_active = values[-1][0] > 0 or values[-1][1] > 0
+        prev_active = values[-2][0] > 0 or values[-2][1] > 0
+        if (last_active or prev_active) and (missing_time <= alarms.MFRR_UPDATE_LEAD_MINUTES or now >= expected_next_interval):
+            message = (f"🚨 Critical: No new mFRR update detected for the next interval starting at {expected_next_interval}. "
+                       f"The next interval may rely solely on aFRR.")
+            raise_alarm(expected_next_interval, message, "Critical")
+
+    return result
+
+
+def random_day(seed):
+    """A random activation frame over (part of) one EET day, the evaluation time and thresholds."""
+    rng = np.random.default_rng(seed)
+    day = datetime.strptime(DAYS[seed % len(DAYS)], "%Y-%m-%d")
+    start = eet_timezone.localize(day).astimezone(pytz.utc)
+    end = eet_timezone.localize(day + timedelta(days=1)).astimezone(pytz.utc)
+    grid = pd.date_range(start, end, freq=alarms.INTERVAL, inclusive="left").tz_convert(eet_timezone)
+    grid = grid[:int(rng.integers(len(grid) // 2, len(grid) + 1))].rename("Interval Start (EET)")
+
+    data = rng.choice([0, 0, 5, 18, 22, 30, 45, 60, 12.5, np.nan], size=(len(grid), len(ACTIVATION_COLUMNS)))
+    df = pd.DataFrame(data, index=grid, columns=ACTIVATION_COLUMNS)
+    now = eet_timezone.normalize(grid[-1].to_pydatetime() + timedelta(minutes=int(rng.integers(0, 60))))
+    thresholds = {
+        "AFRR_SPIKE_THRESHOLD": float(rng.integers(10, 40)),
+        "RATE_OF_CHANGE_THRESHOLD": float(rng.choice([10, 20, 22.5])),
+        "THRESHOLD_AFRR_UP": float(rng.integers(10, 30)),
+    }
+    return df, now, thresholds
+
+
+def as_tuples(raised):
+    return [tuple(alarm[:3]) for alarm in raised]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_rules_match_the_reference_loop(seed):
+    df, now, thresholds = random_day(seed)
+    assert as_tuples(alarms.evaluate_alarms(df, thresholds, now)) == reference_alarms(df, thresholds, now)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_evaluation_raises_the_same_interval_alarms(seed):
+    df, now, thresholds = random_day(seed)
+    state = {}
+    incremental = set()
+    for cut in range(1, len(df) + 1, 7):
+        incremental |= {alarm.key for alarm in alarms.evaluate_new_alarms(df.iloc[:cut], state, thresholds, now)}
+    incremental |= {alarm.key for alarm in alarms.evaluate_new_alarms(df, state, thresholds, now)}
+
+    full = alarms.evaluate_alarms(df, thresholds, now)
+    assert {alarm.key for alarm in full} <= incremental
+    assert incremental - {alarm.key for alarm in full} <= {
+        alarm.key for cut in range(1, len(df) + 1) for alarm in alarms.evaluate_alarms(df.iloc[:cut], thresholds, now)
+        if alarm.rule in CLOCK_RULES
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_profiles_match_one_evaluation_per_profile(seed):
+    df, now, thresholds = random_day(seed)
+    profiles = {"desk": thresholds, "calm": {"AFRR_SPIKE_THRESHOLD": 45.0, "RATE_OF_CHANGE_THRESHOLD": 35.0}, "default": None}
+    evaluated = alarms.evaluate_profiles(df, profiles, now)
+    for name, profile in profiles.items():
+        assert as_tuples(evaluated[name]) == reference_alarms(df, profile, now)
+
+
+def test_no_data_waits_for_the_stale_data_grace_period():
+    midnight = eet_timezone.localize(datetime(2025, 10, 26))
+    assert alarms.evaluate_alarms(pd.DataFrame(), now=midnight + timedelta(minutes=5)) == []
+    late = alarms.evaluate_alarms(pd.DataFrame(), now=midnight + timedelta(hours=2))
+    assert [alarm.rule for alarm in late] == ["no_data"]
+
+
+# Expression compiler=============================================================================
+def rules_with_expression(tmp_path, expression):
+    """Write alarm_rules.json with its first rule's expression replaced and return the path."""
+    with open(alarms.ALARM_RULES_PATH, encoding="utf-8") as f:
+        config = json.load(f)
+    config["rules"][0]["expression"] = expression
+    path = tmp_path / "alarm_rules.json"
+    path.write_text(json.dumps(config), encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("expression", [
+    # Compile, but cannot run on columns
+    "not afrr_up",
+    "afrr_up and mfrr_up > 1",
+    "max(afrr_up) > 1",
+    "abs(afrr_up, 1) > 0",
+    # Not a condition
+    "afrr_up + 1",
+    # Outside the allowed syntax or names
+    "afrr_up.real > 1",
+    "__import__('os') > 1",
+    "unknown_column > 1",
+    "afrr_up > 'a'",
+    "[afrr_up][0] > 1",
+    "afrr_up >",
+])
+def test_load_rules_rejects_expressions(tmp_path, expression):
+    with pytest.raises(ValueError, match="total_direction"):
+        alarms.load_rules(rules_with_expression(tmp_path, expression))
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("(afrr_up > 1) or not (mfrr_up < 2)", lambda c: (c["afrr_up"] > 1) | ~(c["mfrr_up"] < 2)),
+    ("1 < afrr_up <= THRESHOLD_AFRR_UP", lambda c: (1 < c["afrr_up"]) & (c["afrr_up"] <= 20)),
+    ("min(afrr_up, mfrr_up) > prev_afrr_up", lambda c: np.minimum(c["afrr_up"], c["mfrr_up"]) > c["prev_afrr_up"]),
+    ("abs(afrr_up - prev_afrr_up) >= 10 and afrr_up != 0", lambda c: (np.abs(c["afrr_up"] - c["prev_afrr_up"]) >= 10) & (c["afrr_up"] != 0)),
+])
+def test_compiled_expressions_are_elementwise(tmp_path, expression, expected):
+    rules = alarms.load_rules(rules_with_expression(tmp_path, expression))
+    rng = np.random.default_rng(0)
+    namespace = {**alarms.RULE_FUNCTIONS, **rules["thresholds"]}
+    for name in ("afrr_up", "mfrr_up"):
+        column = rng.choice([0.0, 1.0, 5.0, 25.0], size=50)
+        namespace[name], namespace[f"prev_{name}"] = column[1:], column[:-1]
+    result = eval(rules["rules"][0]["expression"], {"__builtins__": {}}, namespace)
+    np.testing.assert_array_equal(result, expected(namespace))
+
+
+def test_a_failing_rule_does_not_silence_the_others():
+    df, now, thresholds = random_day(3)
+    rules = copy.deepcopy(alarms.RULES)
+    names = set(rules["thresholds"]) | set(rules["columns"])
+    broken = rules["rules"][0]["id"], rules["rules"][0]["direction"]
+    rules["rules"][0]["expression"] = alarms.compile_expression("not afrr_up", names, "test")
+
+    expected = [alarm for alarm in alarms.evaluate_alarms(df, thresholds, now) if (alarm.rule, alarm.direction) != broken]
+    assert alarms.evaluate_alarms(df, thresholds, now, rules=rules) == expected